@@ -0,0 +1,304 @@
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+import change_feed
+from query_batch import run_queries
+
+ACCESS_INDEX_REFRESH = float(os.getenv('ACCESS_INDEX_REFRESH', '3600'))  # Seconds between full rebuilds
+ACCESS_INDEX_SYNC_INTERVAL = float(os.getenv('ACCESS_INDEX_SYNC_INTERVAL', '5'))  # Seconds between change-feed pulls
+MANDATE_COLUMN = os.getenv('ACCESS_MANDATE_COLUMN', 'MandateKey')  # Mandate column of bridgemandateteamaccess
+
+USER_TEAM_QUERY = """
+    SELECT dimreportuser.internalemailaddress AS user_email, teamgrouping.TeamName AS team_name
+    FROM minerva_prod.goldaccessmodel.bridgeuserteam
+    INNER JOIN minerva_prod.goldaccessmodel.dimreportuser ON dimreportuser.UserKey = bridgeuserteam.UserKey
+    INNER JOIN minerva_prod.goldaccessmodel.teamgrouping ON teamgrouping.TeamGroupingKey = bridgeuserteam.TeamGroupingKey
+"""
+TEAM_MANDATE_QUERY = f"""
+    SELECT teamgrouping.TeamName AS team_name, bridgemandateteamaccess.{MANDATE_COLUMN} AS mandate
+    FROM minerva_prod.goldaccessmodel.bridgemandateteamaccess
+    INNER JOIN minerva_prod.goldaccessmodel.teamgrouping ON teamgrouping.TeamGroupingKey = bridgemandateteamaccess.TeamGroupingKey
+"""
+
+# Extension tables by the kind used in the grids and bulk imports: (table, the two columns of an edge)
+EXTENSION_TABLES = {
+    'user': ("minerva_dev.accessmodel.managerworkerextension", ('manager_name', 'worker_name')),
+    'team': ("minerva_dev.accessmodel.userteamextension", ('worker_name', 'team_name')),
+}
+
+
+class AccessIndex:
+    """Adjacency structures for the access model with an incrementally maintained closure.
+
+    A manager can see everything their workers can see, transitively, so for every
+    user we keep the set of users they reach through manager -> worker edges (and the
+    reverse). Team membership comes from bridgeuserteam plus userteamextension, and
+    mandates come from bridgemandateteamaccess.
+
+    Extension rows are tracked by id and kept current from the shared change feeds, so
+    edits made through any worker process reach every index within ACCESS_INDEX_SYNC_INTERVAL.
+    """
+
+    def __init__(self):
+        self.loaded_at = 0.0
+        self.synced_at = 0.0  # time.monotonic() of the last change-feed sync
+        self.synced_to = {}  # kind -> warehouse time the extension rows are current to
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._extension_rows = {kind: {} for kind in EXTENSION_TABLES}  # kind -> {id: edge}
+        self._edges = Counter()  # (manager, worker) -> number of rows backing the edge
+        self._user_teams = defaultdict(dict)  # user -> {team: Counter of the tables granting it}
+        self._team_users = defaultdict(set)
+        self._team_mandates = defaultdict(set)
+        self._workers = defaultdict(set)  # manager -> direct workers
+        self._managers = defaultdict(set)  # worker -> direct managers
+        self._reach = defaultdict(set)  # user -> every worker reachable below them
+        self._reached_by = defaultdict(set)  # user -> every manager above them
+
+    @classmethod
+    def from_warehouse(cls):
+        """Build a fresh index from the gold and extension tables."""
+        # Taken before the reads, so every change after it is still in the change feed
+        now = run_queries({'now': change_feed.NOW_QUERY}, use_cache=False, arrow=True)['now']['now'][0].as_py()
+        user_team = run_queries({'user_team': USER_TEAM_QUERY}, arrow=True)['user_team']
+        extensions = run_queries({kind: f"SELECT * FROM {table}" for kind, (table, _) in EXTENSION_TABLES.items()},
+                                 use_cache=False, arrow=True)
+        try:
+            team_mandate = run_queries({'team_mandate': TEAM_MANDATE_QUERY}, arrow=True)['team_mandate']
+        except Exception as e:
+            # Mandates only annotate the lookups, so a wrong ACCESS_MANDATE_COLUMN must not break them
+            print(f"The access index is built without mandates, reading {MANDATE_COLUMN} failed: {str(e)}")
+            team_mandate = None
+        index = cls()
+        with index._lock:
+            for user, team in zip(user_team['user_email'].to_pylist(), user_team['team_name'].to_pylist()):
+                index._add_team_edge(user, team, 'bridgeuserteam')
+            if team_mandate is not None:
+                for team, mandate in zip(team_mandate['team_name'].to_pylist(), team_mandate['mandate'].to_pylist()):
+                    index._team_mandates[team].add(mandate)
+            for kind, rows in extensions.items():
+                index.apply_extension_changes(kind, rows=rows.to_pylist())
+                index.synced_to[kind] = now
+        index.loaded_at = time.time()
+        index.synced_at = time.monotonic()
+        return index
+
+    def sync(self) -> bool:
+        """Apply the extension rows written since the last sync, by any process, from the change feeds.
+
+        Returns False when the index is further behind than the feeds remember and must be rebuilt.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return True  # Another request is already syncing
+        try:
+            for kind, (table, _) in EXTENSION_TABLES.items():
+                changes = change_feed.get_feed(table).latest_since(self.synced_to[kind])
+                if changes is None:
+                    return False
+                rows = changes['rows']
+                self.apply_extension_changes(kind, rows=[row for row in rows.values() if row is not None],
+                                             removed_ids=[row_id for row_id, row in rows.items() if row is None])
+                self.synced_to[kind] = changes['since']
+            self.synced_at = time.monotonic()
+            return True
+        finally:
+            self._sync_lock.release()
+
+    # Edge maintenance
+
+    def apply_extension_changes(self, kind, rows=(), removed_ids=()):
+        """Add or replace extension rows by id and drop deleted ids; applying a change twice is harmless."""
+        columns = EXTENSION_TABLES[kind][1]
+        add, remove = {'user': (self.add_manager_worker, self.remove_manager_worker),
+                       'team': (self.add_user_team, self.remove_user_team)}[kind]
+        with self._lock:
+            known = self._extension_rows[kind]
+            for row_id in removed_ids:
+                edge = known.pop(int(row_id), None)
+                if edge is not None:
+                    remove(*edge)
+            for row in rows:
+                row_id, edge = int(row['id']), tuple(row[col] for col in columns)
+                if known.get(row_id) == edge:
+                    continue
+                if row_id in known:
+                    remove(*known[row_id])
+                known[row_id] = edge
+                add(*edge)
+
+    def add_user_team(self, user, team, source='userteamextension'):
+        with self._lock:
+            self._add_team_edge(user, team, source)
+
+    def remove_user_team(self, user, team, source='userteamextension'):
+        with self._lock:
+            sources = self._user_teams.get(user, {}).get(team)
+            if not sources or sources[source] == 0:
+                return
+            sources[source] -= 1
+            if sources[source] == 0:
+                del sources[source]
+            if not sources:
+                del self._user_teams[user][team]
+                self._team_users[team].discard(user)
+
+    def add_manager_worker(self, manager, worker):
+        """Add a manager -> worker edge and extend the closure of everything above the manager."""
+        with self._lock:
+            key = (manager, worker)
+            self._edges[key] += 1
+            if self._edges[key] > 1 or manager == worker:
+                return
+            self._workers[manager].add(worker)
+            self._managers[worker].add(manager)
+            above = self._reached_by[manager] | {manager}
+            below = self._reach[worker] | {worker}
+            for user in above:
+                self._reach[user] |= below - {user}
+            for user in below:
+                self._reached_by[user] |= above - {user}
+
+    def remove_manager_worker(self, manager, worker):
+        """Remove a manager -> worker edge and recompute the closure only for affected users."""
+        with self._lock:
+            key = (manager, worker)
+            if self._edges[key] == 0:
+                return
+            self._edges[key] -= 1
+            if self._edges[key] > 0:
+                return
+            del self._edges[key]
+            self._workers[manager].discard(worker)
+            self._managers[worker].discard(manager)
+            above = self._reached_by[manager] | {manager}
+            below = self._reach[worker] | {worker}
+            for user in above:
+                self._reach[user] = self._walk(user, self._workers)
+            for user in below:
+                self._reached_by[user] = self._walk(user, self._managers)
+
+    # Lookups
+
+    def teams_for_user(self, user) -> dict:
+        """Every team ``user`` can see, mapped to how the access is granted."""
+        with self._lock:
+            teams = {team: self._source(sources) for team, sources in self._user_teams.get(user, {}).items()}
+            for worker in sorted(self._reach.get(user, ())):
+                for team in self._user_teams.get(worker, {}):
+                    teams.setdefault(team, f"via {worker}")
+            return teams
+
+    def users_for_team(self, team) -> set:
+        """Every user who can see ``team``, directly or as a manager above a member."""
+        with self._lock:
+            users = set(self._team_users.get(team, ()))
+            for member in list(users):
+                users |= self._reached_by.get(member, set())
+            return users
+
+    def mandates_for_user(self, user) -> set:
+        with self._lock:
+            return {mandate for team in self.teams_for_user(user) for mandate in self._team_mandates.get(team, ())}
+
+    def effective_permissions(self, user) -> list:
+        """Rows for the "Effective Permissions" view of one user."""
+        with self._lock:
+            return [
+                {'TeamName': team, 'Source': source, 'Mandates': ', '.join(map(str, sorted(self._team_mandates.get(team, ()))))}
+                for team, source in sorted(self.teams_for_user(user).items())
+            ]
+
+    def team_viewers(self, team) -> list:
+        """Rows for the "who can see this team" view."""
+        with self._lock:
+            members = self._team_users.get(team, set())
+            return [
+                {'User': user, 'Source': self._source(self._user_teams[user][team]) if user in members else 'manager of a member'}
+                for user in sorted(self.users_for_team(team))
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'users': len(self._user_teams),
+                'teams': len(self._team_users),
+                'manager_edges': sum(self._edges.values()),
+                'loaded_at': self.loaded_at,
+            }
+
+    def _add_team_edge(self, user, team, source):
+        self._user_teams[user].setdefault(team, Counter())[source] += 1
+        self._team_users[team].add(user)
+
+    @staticmethod
+    def _source(sources) -> str:
+        # Gold membership wins over an extension override of the same team
+        return 'bridgeuserteam' if 'bridgeuserteam' in sources else next(iter(sources))
+
+    @staticmethod
+    def _walk(start, adjacency) -> set:
+        seen, queue = set(), deque(adjacency.get(start, ()))
+        while queue:
+            user = queue.popleft()
+            if user in seen or user == start:
+                continue
+            seen.add(user)
+            queue.extend(adjacency.get(user, ()))
+        return seen
+
+
+_index = None
+_index_lock = threading.Lock()
+_refreshing = threading.Event()
+
+
+def _refresh():
+    global _index
+    try:
+        _index = AccessIndex.from_warehouse()
+    except Exception as e:
+        print(f"An error occurred while refreshing the access index: {str(e)}")
+    finally:
+        _refreshing.clear()
+
+
+def _start_refresh():
+    if not _refreshing.is_set():
+        _refreshing.set()
+        threading.Thread(target=_refresh, name='access-index-refresh', daemon=True).start()
+
+
+def get_access_index() -> AccessIndex:
+    """Return the process-wide access index, building it on first use.
+
+    Once built, the index pulls other processes' extension edits from the change feed at
+    most every ACCESS_INDEX_SYNC_INTERVAL, and a stale index keeps serving lookups while a
+    background thread rebuilds it.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AccessIndex.from_warehouse()
+    elif time.time() - _index.loaded_at > ACCESS_INDEX_REFRESH:
+        _start_refresh()
+    elif time.monotonic() - _index.synced_at >= ACCESS_INDEX_SYNC_INTERVAL:
+        try:
+            if not _index.sync():
+                _start_refresh()
+        except Exception as e:
+            print(f"An error occurred while syncing the access index: {str(e)}")
+    return _index
+
+
+def current_access_index():
+    """Return the index if it has been built, without triggering a warehouse load."""
+    return _index
+
+
+def reset():
+    """Drop the index so the next lookup rebuilds it, e.g. after switching backends."""
+    global _index
+    _index = None
@@ -1,34 +1,76 @@
+import startup  # First, so the cold-start clock covers every other import
+import atexit
 import os
-from databricks import sql
-import pandas as pd
-import dash
-from dash import dcc, html, Input, Output, State
-import dash_bootstrap_components as dbc
-import dash_ag_grid as dag
-from databricks.sdk.core import Config, oauth_service_principal  # Added import
-from dash.dependencies import ALL  # Added import for ALL
-from flask import request
-
-# Ensure environment variable is set correctly
-assert os.getenv('DATABRICKS_WAREHOUSE_ID'), "DATABRICKS_WAREHOUSE_ID must be set in app.yaml."
-
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
-
-def sqlQuery(query: str) -> pd.DataFrame:
-    """Execute a SQL query and return the result as a pandas DataFrame."""
-    cfg = Config()  # Pull environment variables for auth
-    with sql.connect(
-        server_hostname=cfg.host,
-        http_path=f"/sql/1.0/warehouses/{os.getenv('DATABRICKS_WAREHOUSE_ID')}",
-        credentials_provider=lambda: cfg.authenticate
-    ) as connection:
-        with connection.cursor() as cursor:
-            cursor.execute(query)
-            return cursor.fetchall_arrow().to_pandas()
+import time
+import threading
+
+with startup.phase('import dash'):
+    import dash
+    from dash import dcc, html, Input, Output, State
+    import dash_bootstrap_components as dbc
+    import dash_ag_grid as dag  # Eager: Dash must register its component bundle before the first page
+    from dash.dependencies import ALL  # Added import for ALL
+    from flask import Response, request
+
+with startup.phase('import pandas'):
+    # pyarrow imports pandas by itself on first use (pa.table(), DuckDB scans of Arrow data), from
+    # whichever request thread gets there first, and Dash's JSON encoder breaks on a half-imported
+    # pandas it finds in sys.modules. Importing it before the server accepts requests closes that window.
+    import pandas  # noqa: F401
+    import pyarrow.compute as pc  # Already loaded by pandas
+
+with startup.phase('import app modules'):
+    from backends import SQL_BACKEND
+    import db
+    from db import arrowQuery, sqlQuery, sql_literal, streamQuery  # Pooled warehouse connections
+    import grid_rows
+    from query_batch import run_queries  # Concurrent, de-duplicated queries
+    import columnar
+    from access_index import current_access_index, get_access_index
+    from search_index import get_search_index
+    import metrics
+    import snapshot
+    import background_jobs
+    import bulk_import
+    import export
+    import change_feed
+    from migrate import require_identity_ids
+    from tabs import load_tab_data, tab_query
+
+# Ensure environment variable is set correctly (the local stand-in backend does not need a warehouse)
+assert SQL_BACKEND != 'databricks' or os.getenv('DATABRICKS_WAREHOUSE_ID'), "DATABRICKS_WAREHOUSE_ID must be set in app.yaml."
+
+# 'infinite' pages Access Model Tables rows from the warehouse on demand; 'clientSide' loads whole tables
+GRID_ROW_MODEL = os.getenv('GRID_ROW_MODEL', 'infinite')
+GRID_BLOCK_SIZE = int(os.getenv('GRID_BLOCK_SIZE', '100'))
+# 'search' fills the email/team dropdowns from an in-process index as the user types; 'full' ships every option up front
+DROPDOWN_MODE = os.getenv('DROPDOWN_MODE', 'search')
+GRID_RECONCILE_INTERVAL = int(os.getenv('GRID_RECONCILE_INTERVAL', '10'))  # Seconds between pulls of other users' edits
+GRID_FULL_CHECK_EVERY = int(os.getenv('GRID_FULL_CHECK_EVERY', '30'))  # Also compare table fingerprints every N pulls
+
+USER_EXTENSION_TABLE = "minerva_dev.accessmodel.managerworkerextension"
+TEAM_EXTENSION_TABLE = "minerva_dev.accessmodel.userteamextension"
+
+with startup.phase('create app'):
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True,
+                    background_callback_manager=background_jobs.callback_manager(GRID_ROW_MODEL == 'clientSide'))
+server = app.server  # WSGI entry point for gunicorn (see gunicorn.conf.py)
+metrics.instrument_dash(app)
+startup.instrument(server)  # Prints the startup report after the first response
+metrics.register_gauges('accessmodel_startup', startup.stats)
+metrics.start()  # Shares this worker's metrics with the others through METRICS_DIR, when set
+snapshot.start()  # Local copy of the slowly changing gold tables, shared by every worker on the host
+
+@app.server.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint for query, callback, cache and pool metrics."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 # Define a default layout to ensure the app always has a valid layout
 app.layout = html.Div([
     dcc.Store(id='email-store'),
+    dcc.Store(id='tab-data', data={}),  # Columnar payload of each Access Model Tables tab already sent, kept across page switches
+    dcc.Store(id='tab-versions', data={}),  # Version token of each payload in tab-data
     html.Div(
         [
             dbc.Button("☰", id="sidebar-toggle", color="primary", className="me-1", style={
@@ -128,133 +170,181 @@ def display_email(_):
     email = request.headers.get("X-Forwarded-Email", "Email not found")
     return f"Access Model: {email}", email  # Return email for storage
 
+def tables_page():
+    """The "Access Model Tables" page (the default)."""
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                dcc.Tabs(id='tabs', value='tab1', children=[
+                    dcc.Tab(label='Report Users', value='tab1'),
+                    dcc.Tab(label='Team Grouping', value='tab2'),
+                    dcc.Tab(label='Bridge Mandate Team Access', value='tab3'),
+                    dcc.Tab(label='My Team Permissions', value='tab4'),
+                    dcc.Tab(label='Effective Access', value='tab5')
+                ]),
+                dcc.Loading(
+                    id="loading-icon",
+                    type="circle",
+                    # load_tab_data reports into tab-load-status, so the icon also covers whole-table loads
+                    children=[html.Div(id='tab-content'), html.Div(id='tab-load-status')],
+                    style={'margin-top': '50px'}  # Lower the loading icon further
+                ),
+                dcc.Store(id='tab-load'),  # The clientSide tab whose rows load_tab_data should send
+            ], width=12)
+        ])
+    ], fluid=True)
+
+def add_user_page():
+    """The "Add User to Model" page."""
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col(html.Div(id='add-user-output', className='mt-3'), width=12)  # Move alert container to the top
+        ]),
+        dcc.Store(id='grid-versions'),  # Fingerprints of the rows currently shown in each grid
+        dcc.Store(id='user-grid-columns'),  # Columnar payloads unpacked into rowData in the browser
+        dcc.Store(id='team-grid-columns'),
+        dcc.Interval(id='grid-reconcile-interval', interval=GRID_RECONCILE_INTERVAL * 1000),
+        dbc.Row([
+            dbc.Col(html.H3("Add Manager to Worker Permission", style={'margin-top': '20px', 'text-align': 'center'}), width=6),
+            dbc.Col(html.H3("Add User to Team Permission", style={'margin-top': '20px', 'text-align': 'center'}), width=6)
+        ]),
+        dbc.Row([
+            dbc.Col([
+                dbc.Label("Manager User", style={'font-weight': 'bold'}),
+                dcc.Dropdown(
+                    id='manager-user-dropdown',
+                    placeholder='Select Manager Email',
+                    options=[],
+                    style={'margin-bottom': '15px'}
+                ),
+                dbc.Label("Worker User", style={'font-weight': 'bold'}),
+                dcc.Dropdown(
+                    id='worker-user-dropdown',
+                    placeholder='Select Worker Email',
+                    options=[],
+                    style={'margin-bottom': '15px'}
+                ),
+                dbc.Button("Add Access User", id='add-access-user-btn', color='primary', className='mt-3', style={'width': '100%'}),
+                dbc.Button("Delete Permission", id='delete-permission-btn', color='danger', className='mt-3', style={'width': '100%'})
+            ], width=6),
+            dbc.Col([
+                dbc.Label("Worker Email", style={'font-weight': 'bold'}),
+                dcc.Dropdown(
+                    id='worker-name-dropdown',
+                    placeholder='Select Worker Email',
+                    options=[],
+                    style={'margin-bottom': '15px'}
+                ),
+                dbc.Label("Team Name", style={'font-weight': 'bold'}),
+                dcc.Dropdown(
+                    id='team-name-dropdown',
+                    placeholder='Select Team Name',
+                    options=[],
+                    style={'margin-bottom': '15px'}
+                ),
+                dbc.Button("Add User to Team", id='add-user-to-team-btn', color='primary', className='mt-3', style={'width': '100%'}),
+                dbc.Button("Delete Team Permission", id='delete-team-permission-btn', color='danger', className='mt-3', style={'width': '100%'})
+            ], width=6)
+        ]),
+        dbc.Row([
+            dbc.Col([
+                dbc.Label("Bulk Import", style={'font-weight': 'bold', 'margin-right': '15px'}),
+                dbc.RadioItems(
+                    id='bulk-import-kind',
+                    options=[
+                        {'label': 'Manager → Worker', 'value': 'user'},
+                        {'label': 'Worker → Team', 'value': 'team'}
+                    ],
+                    value='user',
+                    inline=True
+                ),
+                dcc.Upload(
+                    id='bulk-import-upload',
+                    children=html.Div(["Drop or ", html.A("select"), " a CSV/Excel file of pairs"]),
+                    accept='.csv,.xlsx',
+                    style={
+                        'border': '1px dashed #adb5bd',
+                        'border-radius': '5px',
+                        'padding': '6px',
+                        'text-align': 'center'
+                    }
+                )
+            ], width=9, className='mt-3'),
+            dbc.Col([
+                dbc.Button("Refresh", id='refresh-grids-btn', color='secondary', outline=True, size='sm', className='mt-3 mb-2'),
+                html.Div([html.Small("Manager → Worker"), export_links('user-extension')],
+                         className='d-flex justify-content-end align-items-center'),
+                html.Div([html.Small("Worker → Team"), export_links('team-extension')],
+                         className='d-flex justify-content-end align-items-center')
+            ], width=3, style={'text-align': 'right'})
+        ]),
+        dbc.Row([
+            dbc.Col(
+                dcc.Loading(
+                    type="circle",
+                    children=dag.AgGrid(
+                        id='user-grid',
+                        columnDefs=[
+                            {"headerName": "ID", "field": "id", "flex": 0.5},
+                            {"headerName": "Manager Email", "field": "manager_name", "flex": 2, "filter": "agTextColumnFilter"},
+                            {"headerName": "Worker Email", "field": "worker_name", "flex": 2},
+                            {"headerName": "Timestamp", "field": "timestamp", "flex": 1}
+                        ],
+                        rowData=[],
+                        defaultColDef={
+                            "sortable": True,
+                            "filter": True,
+                            "resizable": True,
+                            "cellStyle": {"fontSize": "12px"}
+                        },
+                        getRowId="params.data.id",  # Lets row transactions find rows by id
+                        dashGridOptions={"rowSelection": "single"},
+                        style={'height': 'calc(100vh - 120px)', 'width': '100%'}
+                    )
+                ),
+                width=6,
+                style={'padding-right': '10px'}
+            ),
+            dbc.Col(
+                dcc.Loading(
+                    type="circle",
+                    children=dag.AgGrid(
+                        id='team-grid',
+                        columnDefs=[
+                            {"headerName": "ID", "field": "id", "flex": 0.5},
+                            {"headerName": "Worker Email", "field": "worker_name", "flex": 2},
+                            {"headerName": "Team Name", "field": "team_name", "flex": 1.5},
+                            {"headerName": "Timestamp", "field": "timestamp", "flex": 1}
+                        ],
+                        rowData=[],
+                        defaultColDef={
+                            "sortable": True,
+                            "filter": True,
+                            "resizable": True,
+                            "cellStyle": {"fontSize": "12px"}
+                        },
+                        getRowId="params.data.id",  # Lets row transactions find rows by id
+                        dashGridOptions={"rowSelection": "single"},
+                        style={'height': 'calc(100vh - 120px)', 'width': '100%'}
+                    )
+                ),
+                width=6,
+                style={'padding-left': '10px'}
+            )
+        ])
+    ], fluid=True)
+
 @app.callback(
     Output('main-layout', 'children'),
     [Input('tables-link', 'n_clicks'), Input('add-user-link', 'n_clicks')]
 )
 def render_page(tables_click, add_user_click):
+    # Each page's layout is only built when it is shown
     ctx = dash.callback_context
     if not ctx.triggered or ctx.triggered[0]['prop_id'].split('.')[0] == 'tables-link':
-        # Default page: "Access Model Tables"
-        return dbc.Container([
-            dbc.Row([
-                dbc.Col([
-                    dcc.Tabs(id='tabs', value='tab1', children=[
-                        dcc.Tab(label='Report Users', value='tab1'),
-                        dcc.Tab(label='Team Grouping', value='tab2'),
-                        dcc.Tab(label='Bridge Mandate Team Access', value='tab3'),
-                        dcc.Tab(label='My Team Permissions', value='tab4')
-                    ]),
-                    dcc.Loading(
-                        id="loading-icon",
-                        type="circle",
-                        children=html.Div(id='tab-content'),
-                        style={'margin-top': '50px'}  # Lower the loading icon further
-                    ),
-                ], width=12)
-            ])
-        ], fluid=True)
-
+        return tables_page()
     elif ctx.triggered[0]['prop_id'].split('.')[0] == 'add-user-link':
-        return dbc.Container([
-            dbc.Row([
-                dbc.Col(html.Div(id='add-user-output', className='mt-3'), width=12)  # Move alert container to the top
-            ]),
-            dbc.Row([
-                dbc.Col(html.H3("Add Manager to Worker Permission", style={'margin-top': '20px', 'text-align': 'center'}), width=6),
-                dbc.Col(html.H3("Add User to Team Permission", style={'margin-top': '20px', 'text-align': 'center'}), width=6)
-            ]),
-            dbc.Row([
-                dbc.Col([
-                    dbc.Label("Manager User", style={'font-weight': 'bold'}),
-                    dcc.Dropdown(
-                        id='manager-user-dropdown',
-                        placeholder='Select Manager Email',
-                        options=[],
-                        style={'margin-bottom': '15px'}
-                    ),
-                    dbc.Label("Worker User", style={'font-weight': 'bold'}),
-                    dcc.Dropdown(
-                        id='worker-user-dropdown',
-                        placeholder='Select Worker Email',
-                        options=[],
-                        style={'margin-bottom': '15px'}
-                    ),
-                    dbc.Button("Add Access User", id='add-access-user-btn', color='primary', className='mt-3', style={'width': '100%'}),
-                    dbc.Button("Delete Permission", id='delete-permission-btn', color='danger', className='mt-3', style={'width': '100%'})
-                ], width=6),
-                dbc.Col([
-                    dbc.Label("Worker Email", style={'font-weight': 'bold'}),
-                    dcc.Dropdown(
-                        id='worker-name-dropdown',
-                        placeholder='Select Worker Email',
-                        options=[],
-                        style={'margin-bottom': '15px'}
-                    ),
-                    dbc.Label("Team Name", style={'font-weight': 'bold'}),
-                    dcc.Dropdown(
-                        id='team-name-dropdown',
-                        placeholder='Select Team Name',
-                        options=[],
-                        style={'margin-bottom': '15px'}
-                    ),
-                    dbc.Button("Add User to Team", id='add-user-to-team-btn', color='primary', className='mt-3', style={'width': '100%'}),
-                    dbc.Button("Delete Team Permission", id='delete-team-permission-btn', color='danger', className='mt-3', style={'width': '100%'})
-                ], width=6)
-            ]),
-            dbc.Row([
-                dbc.Col(
-                    dcc.Loading(
-                        type="circle",
-                        children=dag.AgGrid(
-                            id='user-grid',
-                            columnDefs=[
-                                {"headerName": "ID", "field": "id", "flex": 0.5},
-                                {"headerName": "Manager Email", "field": "manager_name", "flex": 2, "filter": "agTextColumnFilter"},
-                                {"headerName": "Worker Email", "field": "worker_name", "flex": 2},
-                                {"headerName": "Timestamp", "field": "timestamp", "flex": 1}
-                            ],
-                            rowData=[],
-                            defaultColDef={
-                                "sortable": True,
-                                "filter": True,
-                                "resizable": True,
-                                "cellStyle": {"fontSize": "12px"}
-                            },
-                            dashGridOptions={"rowSelection": "single"},
-                            style={'height': 'calc(100vh - 120px)', 'width': '100%'}
-                        )
-                    ),
-                    width=6,
-                    style={'padding-right': '10px'}
-                ),
-                dbc.Col(
-                    dcc.Loading(
-                        type="circle",
-                        children=dag.AgGrid(
-                            id='team-grid',
-                            columnDefs=[
-                                {"headerName": "ID", "field": "id", "flex": 0.5},
-                                {"headerName": "Worker Email", "field": "worker_name", "flex": 2},
-                                {"headerName": "Team Name", "field": "team_name", "flex": 1.5},
-                                {"headerName": "Timestamp", "field": "timestamp", "flex": 1}
-                            ],
-                            rowData=[],
-                            defaultColDef={
-                                "sortable": True,
-                                "filter": True,
-                                "resizable": True,
-                                "cellStyle": {"fontSize": "12px"}
-                            },
-                            dashGridOptions={"rowSelection": "single"},
-                            style={'height': 'calc(100vh - 120px)', 'width': '100%'}
-                        )
-                    ),
-                    width=6,
-                    style={'padding-left': '10px'}
-                )
-            ])
-        ], fluid=True)
+        return add_user_page()
     else:
         return html.Div("Page not found.")
 
@@ -270,34 +360,172 @@ def toggle_sidebar(n_clicks, sidebar_style):
         sidebar_style['left'] = '-250px'
     return sidebar_style
 
+def snapshot_freshness(query):
+    """Note under the tabs saying how old the local snapshot behind a table is, if it is served from one."""
+    written_at = snapshot.get_snapshot().written_at(query)
+    if written_at is None:
+        return None
+    minutes = int((time.time() - written_at) // 60)
+    return html.Small(
+        f"Reference data as of {time.strftime('%Y-%m-%d %H:%M', time.localtime(written_at))} "
+        f"({'just now' if minutes < 1 else f'{minutes} min ago'})",
+        className='text-muted d-block mt-2'
+    )
+
+EXPORT_QUERIES = {
+    'user-extension': f"SELECT * FROM {USER_EXTENSION_TABLE}",
+    'team-extension': f"SELECT * FROM {TEAM_EXTENSION_TABLE}",
+}
+
+@app.server.route('/export/<name>.<fmt>')
+def export_table(name, fmt):
+    """Download a tab or extension table as CSV or Parquet, streamed from the cursor in chunks."""
+    email = request.headers.get("X-Forwarded-Email")
+    query = EXPORT_QUERIES.get(name) or tab_query(name, email)
+    if query is None or fmt not in export.FORMATS:
+        return Response("Unknown export.", status=404, mimetype='text/plain')
+    chunks = export.stream(streamQuery(query, export.EXPORT_BATCH_ROWS), fmt)
+    try:
+        first = next(chunks)  # Surface query errors as a status code rather than a truncated file
+    except TimeoutError as e:
+        return Response(str(e), status=503, mimetype='text/plain', headers={'Retry-After': '10'})
+    except Exception as e:
+        print(f"An error occurred while exporting {name}: {str(e)}")
+        return Response(f"An error occurred: {str(e)}", status=500, mimetype='text/plain')
+
+    def body():
+        yield first
+        yield from chunks  # Closing the response closes the cursor and its connection
+
+    return Response(body(), mimetype=export.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="access_model_{name}.{fmt}"'})
+
+def export_links(name):
+    """CSV/Parquet download buttons for a table served by export_table."""
+    return html.Div([
+        dbc.Button(label, href=f"/export/{name}.{fmt}", external_link=True, color='secondary', outline=True, size='sm', className='ms-2')
+        for fmt, label in (('csv', 'CSV'), ('parquet', 'Parquet'))
+    ], className='mt-2')
+
+def tab_version(query, columns):
+    """Version token of a tab's current contents, compared with the one the browser already holds."""
+    version = arrowQuery(grid_rows.version_query(query, columns))
+    return f"{version['row_count'][0].as_py()}:{version['checksum'][0].as_py()}"
+
 @app.callback(
-    Output('tab-content', 'children'),
+    [Output('tab-content', 'children'),
+     Output('tab-load', 'data')],
     [Input('tabs', 'value'),
-     Input('email-store', 'data')]  # Use the stored email as input
+     Input('email-store', 'data')],  # Use the stored email as input
+    State('tab-versions', 'data')
 )
-def render_table(tab, email):
-    if tab == 'tab1':
-        query = "SELECT UserKey, EmployeeNumber, internalemailaddress as EmailAddress, fullname as Name FROM minerva_prod.goldaccessmodel.dimreportuser"
-    elif tab == 'tab2':
-        query = "SELECT TeamGroupingKey, TeamName, Office, City FROM minerva_prod.goldaccessmodel.teamgrouping"
-    elif tab == 'tab3':
-        query = "SELECT * FROM minerva_prod.goldaccessmodel.bridgemandateteamaccess"
-    elif tab == 'tab4':  # Handle the new "Own Permission" tab
-        query = f"SELECT dimreportuser.UserKey, EmployeeNumber, internalemailaddress as Email, fullname as Name, TeamName FROM minerva_prod.goldaccessmodel.dimreportuser INNER JOIN minerva_prod.goldaccessmodel.bridgeuserteam on dimreportuser.UserKey = bridgeuserteam.UserKey INNER JOIN minerva_prod.goldaccessmodel.teamgrouping on teamgrouping.TeamGroupingKey = bridgeuserteam.TeamGroupingKey WHERE internalemailaddress='{email}'"
-    else:
-        return html.Div("No data available.")
+def render_table(tab, email, versions):
+    """Lay out a tab in the request; a clientSide grid whose rows the browser lacks asks load_tab_data for them."""
+    if tab == 'tab5':
+        return html.Div([
+            dbc.Row([
+                dbc.Col(dbc.RadioItems(
+                    id='effective-access-mode',
+                    options=[
+                        {'label': 'What can this user see?', 'value': 'user'},
+                        {'label': 'Who can see this team?', 'value': 'team'}
+                    ],
+                    value='user',
+                    inline=True
+                ), width='auto'),
+                dbc.Col(dcc.Input(
+                    id='effective-access-input',
+                    value=email,
+                    debounce=True,
+                    placeholder='User email or team name',
+                    style={'width': '100%'}
+                ))
+            ], className='mt-3 mb-2'),
+            dag.AgGrid(
+                id='effective-access-grid',
+                columnDefs=[],
+                rowData=[],
+                defaultColDef={"sortable": True, "filter": True, "resizable": True, "flex": 1},
+                style={'height': 'calc(100vh - 160px)', 'width': '100%'}
+            )
+        ]), dash.no_update
+
+    query = tab_query(tab, email)
+    if query is None:
+        return html.Div("No data available."), dash.no_update
 
     try:
-        table_data = sqlQuery(query)
-        return dag.AgGrid(
-            id='data-grid',
-            columnDefs=[{"headerName": col, "field": col, "flex": 1} for col in table_data.columns],
-            rowData=table_data.to_dict('records'),
-            defaultColDef={"sortable": True, "filter": True, "resizable": True},
-            style={'height': 'calc(100vh - 100px)', 'width': '100%'}  # Adjust height dynamically
-        )
+        toolbar = html.Div([snapshot_freshness(query), export_links(tab)],
+                           className='d-flex justify-content-between align-items-center')
+        columns = arrowQuery(grid_rows.columns_query(query))
+        if GRID_ROW_MODEL == 'infinite':
+            # Only the column layout is sent here; rows are requested in blocks by load_grid_rows
+            numeric = columnar.numeric_fields(columns)
+            return html.Div([toolbar, dag.AgGrid(
+                id='data-grid',
+                columnDefs=[
+                    {"headerName": col, "field": col, "flex": 1,
+                     "filter": "agNumberColumnFilter" if col in numeric else "agTextColumnFilter"}
+                    for col in columns.column_names
+                ],
+                rowModelType='infinite',
+                defaultColDef={"sortable": True, "resizable": True},
+                dashGridOptions={"cacheBlockSize": GRID_BLOCK_SIZE, "maxBlocksInCache": 10, "infiniteInitialRowCount": GRID_BLOCK_SIZE},
+                style={'height': 'calc(100vh - 100px)', 'width': '100%'}  # Adjust height dynamically
+            )]), dash.no_update
+
+        grid = html.Div([
+            toolbar,
+            dcc.Store(id='data-grid-tab', data=tab),  # Which tab-data payload the grid shows
+            dag.AgGrid(
+                id='data-grid',
+                columnDefs=[{"headerName": col, "field": col, "flex": 1} for col in columns.column_names],
+                rowData=[],
+                defaultColDef={"sortable": True, "filter": True, "resizable": True},
+                style={'height': 'calc(100vh - 100px)', 'width': '100%'}  # Adjust height dynamically
+            )
+        ])
+        # Revisiting a tab: a fingerprint query instead of resending every row the browser already has
+        version = tab_version(query, columns.column_names)
+        if (versions or {}).get(tab) == version:
+            return grid, dash.no_update
+        return grid, {'tab': tab, 'version': version}
     except Exception as e:
-        return html.Div(f"An error occurred: {str(e)}")
+        return html.Div(f"An error occurred: {str(e)}"), dash.no_update
+
+# Only whole-table loads run as jobs, so a slow table does not tie up a web worker; a newer
+# load terminates the superseded job, and leaving the page cancels it
+app.callback(
+    [Output('tab-data', 'data'),
+     Output('tab-versions', 'data'),
+     Output('tab-load-status', 'children')],
+    Input('tab-load', 'data'),
+    State('email-store', 'data'),
+    **background_jobs.options(GRID_ROW_MODEL == 'clientSide',
+                              cancel=[Input('tables-link', 'n_clicks'), Input('add-user-link', 'n_clicks')])
+)(load_tab_data)
+
+@app.callback(
+    Output('data-grid', 'getRowsResponse'),
+    Input('data-grid', 'getRowsRequest'),
+    [State('tabs', 'value'),
+     State('email-store', 'data')]
+)
+def load_grid_rows(rows_request, tab, email):
+    """Serve one block of rows to the infinite-model grid, with sorting and filtering done in SQL."""
+    query = tab_query(tab, email)
+    if not rows_request or query is None:
+        return dash.no_update
+    try:
+        columns = arrowQuery(grid_rows.columns_query(query)).column_names
+        results = run_queries({
+            'page': grid_rows.page_query(query, columns, rows_request),
+            'count': grid_rows.count_query(query, columns, rows_request)
+        }, arrow=True)
+        return {"rowData": columnar.to_records(results['page']), "rowCount": results['count']['row_count'][0].as_py()}
+    except Exception as e:
+        print(f"An error occurred while loading grid rows: {str(e)}")
+        return {"rowData": [], "rowCount": 0}
 
 @app.callback(
     [Output('manager-user-dropdown', 'options'),
@@ -306,8 +534,11 @@ def render_table(tab, email):
 )
 def populate_user_dropdowns(n_clicks):
     try:
+        if DROPDOWN_MODE == 'search':
+            get_search_index('emails')  # Warm the index; options arrive via search_dropdown as the user types
+            return dash.no_update, dash.no_update
         query = "SELECT DISTINCT internalemailaddress FROM minerva_prod.goldaccessmodel.dimreportuser"
-        email_data = sqlQuery(query)
+        email_data = run_queries({'emails': query})['emails']  # Shares the in-flight query with populate_team_dropdowns
         email_options = [{'label': email, 'value': email} for email in email_data['internalemailaddress']]
         return email_options, email_options
     except Exception as e:
@@ -321,125 +552,351 @@ def populate_user_dropdowns(n_clicks):
 )
 def populate_team_dropdowns(n_clicks):
     try:
-        # Query for worker emails
-        worker_query = "SELECT DISTINCT internalemailaddress FROM minerva_prod.goldaccessmodel.dimreportuser"
-        worker_data = sqlQuery(worker_query)
-        worker_options = [{'label': email, 'value': email} for email in worker_data['internalemailaddress']]
-
-        # Query for team names
-        team_query = "SELECT DISTINCT TeamName FROM minerva_prod.goldaccessmodel.teamgrouping"
-        team_data = sqlQuery(team_query)
-        team_options = [{'label': team, 'value': team} for team in team_data['TeamName']]
+        if DROPDOWN_MODE == 'search':
+            get_search_index('emails')
+            get_search_index('teams')
+            return dash.no_update, dash.no_update
+        # Query for worker emails and team names concurrently
+        results = run_queries({
+            'workers': "SELECT DISTINCT internalemailaddress FROM minerva_prod.goldaccessmodel.dimreportuser",
+            'teams': "SELECT DISTINCT TeamName FROM minerva_prod.goldaccessmodel.teamgrouping"
+        })
+        worker_options = [{'label': email, 'value': email} for email in results['workers']['internalemailaddress']]
+        team_options = [{'label': team, 'value': team} for team in results['teams']['TeamName']]
 
         return worker_options, team_options
     except Exception as e:
         print(f"An error occurred while fetching dropdown data: {str(e)}")
         return [], []
 
+def search_dropdown(index_name):
+    """Build a search_value callback returning the top matches from one search index."""
+    def update_options(search_value, value):
+        if DROPDOWN_MODE != 'search' or not search_value:
+            return dash.no_update
+        try:
+            options = get_search_index(index_name).options(search_value)
+        except Exception as e:
+            print(f"An error occurred while searching {index_name}: {str(e)}")
+            return dash.no_update
+        if value and all(option['value'] != value for option in options):
+            options.insert(0, {'label': value, 'value': value})  # Keep the current selection valid
+        return options
+    return update_options
+
+for dropdown_id, index_name in [('manager-user-dropdown', 'emails'), ('worker-user-dropdown', 'emails'),
+                                ('worker-name-dropdown', 'emails'), ('team-name-dropdown', 'teams')]:
+    app.callback(
+        Output(dropdown_id, 'options', allow_duplicate=True),
+        Input(dropdown_id, 'search_value'),
+        State(dropdown_id, 'value'),
+        prevent_initial_call=True
+    )(search_dropdown(index_name))
+
+def table_version_query(table):
+    """Query for a cheap fingerprint (row count and id sum) of an extension table."""
+    return f"SELECT COUNT(*) AS row_count, COALESCE(SUM(id), 0) AS id_sum FROM {table}"
+
+def table_version(version):
+    """Turn the result of table_version_query into a JSON-friendly fingerprint."""
+    return [int(version['row_count'][0].as_py()), int(version['id_sum'][0].as_py())]
+
+def rows_version(rows):
+    """Fingerprint of rows already held by a grid (an Arrow table), comparable with table_version."""
+    return [rows.num_rows, int(pc.sum(rows['id']).as_py() or 0)]
+
+def grid_state(rows, since):
+    """Sync state kept in the browser for a grid: its fingerprint, change-feed high-water mark and own writes.
+
+    ``since`` is read before the rows, so rows committed in between are already shown; their
+    inserts count as applied, so the feed does not add them a second time.
+    """
+    since = change_feed.to_datetime(since)
+    shown = [['insert', int(row_id)] for row_id, at in zip(rows['id'].to_pylist(), rows['timestamp'].to_pylist())
+             if at is not None and change_feed.to_datetime(at) > since]
+    return {'version': rows_version(rows), 'since': change_feed.to_text(since), 'applied': shown}
+
+def note_own_changes(state, added=(), removed_ids=()):
+    """Account for rows this session wrote itself, so the change feed does not deliver them again."""
+    count, id_sum = state['version']
+    added_ids = [int(row['id']) for row in added]
+    state['version'] = [count + len(added_ids) - len(removed_ids), id_sum + sum(added_ids) - sum(removed_ids)]
+    state['applied'] = state['applied'] + [['insert', row_id] for row_id in added_ids] + [['delete', int(row_id)] for row_id in removed_ids]
+    return state
+
+def apply_changes(state, changes):
+    """Fold a change-feed delta into a grid's sync state and return its row transaction (or no_update)."""
+    count, id_sum = state['version']
+    added_ids = [int(row['id']) for row in changes['add']]
+    removed_ids = changes['remove']
+    state['version'] = [count + len(added_ids) - len(removed_ids), id_sum + sum(added_ids) - sum(removed_ids)]
+    state['since'] = changes['since']
+    state['applied'] = [event for event in state['applied'] if event not in changes['skipped']]
+    transaction = {'add': changes['add'], 'update': changes['update'], 'remove': [{'id': row_id} for row_id in removed_ids]}
+    transaction = {key: rows for key, rows in transaction.items() if rows}
+    return transaction or dash.no_update
+
+def delete_extension_row(table, row_id):
+    """Delete one permission row and leave a tombstone so other sessions drop it too.
+
+    The warehouse has no multi-statement transactions, so a failed tombstone does not fail
+    the delete; other grids then pick it up from the periodic fingerprint check instead.
+    """
+    sqlQuery(f"DELETE FROM {table} WHERE id = {int(row_id)}")
+    try:
+        change_feed.record_deletes(table, [row_id])
+    except Exception as e:
+        print(f"Deleted row {int(row_id)} from {table}, but could not record its tombstone: {str(e)}")
+
+def insert_extension_row(table, columns):
+    """Insert one permission row and return it as the warehouse stored it."""
+    require_identity_ids(table)
+    names = ', '.join(columns)
+    values = ', '.join(sql_literal(value) for value in columns.values())
+    sqlQuery(f"INSERT INTO {table} ({names}, timestamp) VALUES ({values}, CURRENT_TIMESTAMP)")  # The identity column assigns the id
+    match = ' AND '.join(f"{name} IS NULL" if value is None else f"{name} = {sql_literal(value)}" for name, value in columns.items())
+    return columnar.to_records(arrowQuery(f"SELECT * FROM {table} WHERE {match} ORDER BY id DESC LIMIT 1", use_cache=False))
+
 @app.callback(
-    [Output('user-grid', 'rowData'),
-     Output('team-grid', 'rowData'),
-     Output('add-user-output', 'children')],  # Combine outputs into one callback
+    [Output('user-grid-columns', 'data'),
+     Output('team-grid-columns', 'data'),
+     Output('user-grid', 'rowTransaction'),
+     Output('team-grid', 'rowTransaction'),
+     Output('add-user-output', 'children'),
+     Output('grid-versions', 'data')],  # Combine outputs into one callback
     [Input('main-layout', 'children'),
      Input('add-access-user-btn', 'n_clicks'),
      Input('delete-permission-btn', 'n_clicks'),
      Input('add-user-to-team-btn', 'n_clicks'),
-     Input('delete-team-permission-btn', 'n_clicks')],  # Combine inputs for both grids
+     Input('delete-team-permission-btn', 'n_clicks'),
+     Input('grid-reconcile-interval', 'n_intervals'),
+     Input('refresh-grids-btn', 'n_clicks')],  # Combine inputs for both grids
     [State('manager-user-dropdown', 'value'),
      State('worker-user-dropdown', 'value'),
      State('worker-name-dropdown', 'value'),
      State('team-name-dropdown', 'value'),
      State('user-grid', 'selectedRows'),
      State('team-grid', 'selectedRows'),
-     State('user-grid', 'rowData'),
-     State('team-grid', 'rowData')]
+     State('grid-versions', 'data')]
 )
 def manage_grids(page_load, add_user_click, delete_user_click, add_team_click, delete_team_click,
+                 reconcile_interval, refresh_click,
                  manager_user, worker_user, worker_name, team_name,
-                 user_selected_rows, team_selected_rows, user_grid_data, team_grid_data):
+                 user_selected_rows, team_selected_rows, versions):
+    """Load both extension grids, then keep them current with row transactions.
+
+    Writes only send the affected row to the browser. On the reconcile interval each grid
+    pulls the rows other sessions inserted or deleted since its high-water mark from the
+    shared change feed. Every GRID_FULL_CHECK_EVERY pulls (and on Refresh) the table
+    fingerprints are compared too, and a grid that drifted is reloaded in full.
+    """
+    no_update = dash.no_update
     ctx = dash.callback_context
     if not ctx.triggered:
-        return user_grid_data, team_grid_data, None
+        return no_update, no_update, no_update, no_update, None, no_update
 
     triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
+    versions = dict(versions or {})
 
     # Fetch data for both grids on page load
     if triggered_id == 'main-layout':
         try:
-            user_query = "SELECT * FROM minerva_dev.accessmodel.managerworkerextension"
-            user_data = sqlQuery(user_query)
-            team_query = "SELECT * FROM minerva_dev.accessmodel.userteamextension"
-            team_data = sqlQuery(team_query)
-            return user_data.to_dict('records'), team_data.to_dict('records'), None
+            # The high-water mark before the rows: a row committed in between is then in both, not in neither
+            now = run_queries({'now': change_feed.NOW_QUERY}, use_cache=False, arrow=True)['now']['now'][0].as_py()
+            results = run_queries({
+                'user': f"SELECT * FROM {USER_EXTENSION_TABLE}",
+                'team': f"SELECT * FROM {TEAM_EXTENSION_TABLE}"
+            }, use_cache=False, arrow=True)
+            versions = {'user': grid_state(results['user'], now), 'team': grid_state(results['team'], now)}
+            return columnar.to_columns(results['user']), columnar.to_columns(results['team']), no_update, no_update, None, versions
         except Exception as e:
             print(f"An error occurred while loading data: {str(e)}")
-            return [], [], dbc.Alert(f"An error occurred while loading data: {str(e)}", color="danger")
+            empty = {'fields': [], 'columns': [], 'length': 0}
+            return empty, empty, no_update, no_update, dbc.Alert(f"An error occurred while loading data: {str(e)}", color="danger"), no_update
+
+    # Pull other sessions' edits, and reload a grid only when its changes cannot be replayed
+    if triggered_id in ('grid-reconcile-interval', 'refresh-grids-btn'):
+        if not versions:
+            return no_update, no_update, no_update, no_update, no_update, no_update
+        try:
+            tables = {kind: table for kind, table in (('user', USER_EXTENSION_TABLE), ('team', TEAM_EXTENSION_TABLE)) if kind in versions}
+            data = {'user': no_update, 'team': no_update}
+            transactions = {'user': no_update, 'team': no_update}
+            reload = set()
+            for kind, table in tables.items():
+                changes = change_feed.get_feed(table).changes_since(versions[kind]['since'], versions[kind]['applied'])
+                if changes is None:
+                    reload.add(kind)  # Further behind than the feed remembers
+                else:
+                    transactions[kind] = apply_changes(versions[kind], changes)
+            if triggered_id == 'refresh-grids-btn' or not (reconcile_interval or 0) % GRID_FULL_CHECK_EVERY:
+                current = run_queries({kind: table_version_query(table) for kind, table in tables.items() if kind not in reload},
+                                      use_cache=False, arrow=True)
+                reload |= {kind for kind, version in current.items() if table_version(version) != versions[kind]['version']}
+            if reload:
+                now = run_queries({'now': change_feed.NOW_QUERY}, use_cache=False, arrow=True)['now']['now'][0].as_py()
+                results = run_queries({kind: f"SELECT * FROM {tables[kind]}" for kind in reload}, use_cache=False, arrow=True)
+                for kind in reload:
+                    data[kind] = columnar.to_columns(results[kind])
+                    versions[kind] = grid_state(results[kind], now)
+                    transactions[kind] = no_update  # The reload already includes the delta
+            return data['user'], data['team'], transactions['user'], transactions['team'], no_update, versions
+        except Exception as e:
+            print(f"An error occurred while refreshing data: {str(e)}")
+            return no_update, no_update, no_update, no_update, no_update, no_update
 
     # Handle user-grid operations
     if triggered_id == 'add-access-user-btn' and add_user_click:
         if not manager_user or not worker_user:
-            return user_grid_data, team_grid_data, dbc.Alert("Manager and Worker fields cannot be empty.", color="warning")
+            return no_update, no_update, no_update, no_update, dbc.Alert("Manager and Worker fields cannot be empty.", color="warning"), no_update
         try:
-            query = f"""
-                INSERT INTO minerva_dev.accessmodel.managerworkerextension (id, manager_name, worker_name, timestamp)
-                SELECT COALESCE(MAX(id), 0) + 1, '{manager_user}', '{worker_user}', CURRENT_TIMESTAMP
-                FROM minerva_dev.accessmodel.managerworkerextension
-            """
-            sqlQuery(query)
-            query = "SELECT * FROM minerva_dev.accessmodel.managerworkerextension"
-            user_data = sqlQuery(query)
-            return user_data.to_dict('records'), team_grid_data, dbc.Alert("User added successfully.", color="success")
+            added = insert_extension_row(USER_EXTENSION_TABLE, {'manager_name': manager_user, 'worker_name': worker_user})
+            index = current_access_index()
+            if index is not None:
+                index.apply_extension_changes('user', rows=added)
+            if 'user' in versions:
+                versions['user'] = note_own_changes(versions['user'], added=added)
+            return no_update, no_update, {'add': added}, no_update, dbc.Alert("User added successfully.", color="success"), versions
         except Exception as e:
             print(f"An error occurred while adding a user: {str(e)}")
-            return user_grid_data, team_grid_data, dbc.Alert(f"An error occurred while adding the user: {str(e)}", color="danger")
+            return no_update, no_update, no_update, no_update, dbc.Alert(f"An error occurred while adding the user: {str(e)}", color="danger"), no_update
 
     elif triggered_id == 'delete-permission-btn' and delete_user_click:
         if user_selected_rows:
             try:
-                row_id = user_selected_rows[0]['id']
-                query = f"DELETE FROM minerva_dev.accessmodel.managerworkerextension WHERE id = {row_id}"
-                sqlQuery(query)
-                query = "SELECT * FROM minerva_dev.accessmodel.managerworkerextension"
-                user_data = sqlQuery(query)
-                return user_data.to_dict('records'), team_grid_data, dbc.Alert(f"Row with ID {row_id} deleted successfully.", color="success")
+                row_id = int(user_selected_rows[0]['id'])
+                delete_extension_row(USER_EXTENSION_TABLE, row_id)
+                index = current_access_index()
+                if index is not None:
+                    index.apply_extension_changes('user', removed_ids=[row_id])
+                if 'user' in versions:
+                    versions['user'] = note_own_changes(versions['user'], removed_ids=[row_id])
+                return no_update, no_update, {'remove': [{'id': row_id}]}, no_update, dbc.Alert(f"Row with ID {row_id} deleted successfully.", color="success"), versions
             except Exception as e:
                 print(f"An error occurred while deleting a user: {str(e)}")
-                return user_grid_data, team_grid_data, dbc.Alert(f"An error occurred while deleting the row: {str(e)}", color="danger")
+                return no_update, no_update, no_update, no_update, dbc.Alert(f"An error occurred while deleting the row: {str(e)}", color="danger"), no_update
         else:
-            return user_grid_data, team_grid_data, dbc.Alert("No row selected for deletion.", color="warning")
+            return no_update, no_update, no_update, no_update, dbc.Alert("No row selected for deletion.", color="warning"), no_update
 
     # Handle team-grid operations
     elif triggered_id == 'add-user-to-team-btn' and add_team_click:
+        if not worker_name or not team_name:
+            return no_update, no_update, no_update, no_update, dbc.Alert("Worker and Team fields cannot be empty.", color="warning"), no_update
         try:
-            query = f"""
-                INSERT INTO minerva_dev.accessmodel.userteamextension (id, worker_name, team_name, timestamp)
-                SELECT COALESCE(MAX(id), 0) + 1, '{worker_name}', '{team_name}', CURRENT_TIMESTAMP
-                FROM minerva_dev.accessmodel.userteamextension
-            """
-            sqlQuery(query)
-            query = "SELECT * FROM minerva_dev.accessmodel.userteamextension"
-            team_data = sqlQuery(query)
-            return user_grid_data, team_data.to_dict('records'), dbc.Alert("Team permission added successfully.", color="success")
+            added = insert_extension_row(TEAM_EXTENSION_TABLE, {'worker_name': worker_name, 'team_name': team_name})
+            index = current_access_index()
+            if index is not None:
+                index.apply_extension_changes('team', rows=added)
+            if 'team' in versions:
+                versions['team'] = note_own_changes(versions['team'], added=added)
+            return no_update, no_update, no_update, {'add': added}, dbc.Alert("Team permission added successfully.", color="success"), versions
         except Exception as e:
             print(f"An error occurred while adding a team permission: {str(e)}")
-            return user_grid_data, team_grid_data, dbc.Alert(f"An error occurred while adding the team permission: {str(e)}", color="danger")
+            return no_update, no_update, no_update, no_update, dbc.Alert(f"An error occurred while adding the team permission: {str(e)}", color="danger"), no_update
 
     elif triggered_id == 'delete-team-permission-btn' and delete_team_click:
         if team_selected_rows:
             try:
-                row_id = team_selected_rows[0]['id']
-                query = f"DELETE FROM minerva_dev.accessmodel.userteamextension WHERE id = {row_id}"
-                sqlQuery(query)
-                query = "SELECT * FROM minerva_dev.accessmodel.userteamextension"
-                team_data = sqlQuery(query)
-                return user_grid_data, team_data.to_dict('records'), dbc.Alert(f"Row with ID {row_id} deleted successfully.", color="success")
+                row_id = int(team_selected_rows[0]['id'])
+                delete_extension_row(TEAM_EXTENSION_TABLE, row_id)
+                index = current_access_index()
+                if index is not None:
+                    index.apply_extension_changes('team', removed_ids=[row_id])
+                if 'team' in versions:
+                    versions['team'] = note_own_changes(versions['team'], removed_ids=[row_id])
+                return no_update, no_update, no_update, {'remove': [{'id': row_id}]}, dbc.Alert(f"Row with ID {row_id} deleted successfully.", color="success"), versions
             except Exception as e:
                 print(f"An error occurred while deleting a team permission: {str(e)}")
-                return user_grid_data, team_grid_data, dbc.Alert(f"An error occurred while deleting the row: {str(e)}", color="danger")
+                return no_update, no_update, no_update, no_update, dbc.Alert(f"An error occurred while deleting the row: {str(e)}", color="danger"), no_update
+        else:
+            return no_update, no_update, no_update, no_update, dbc.Alert("No row selected for deletion.", color="warning"), no_update
+
+    return no_update, no_update, no_update, no_update, None, no_update
+
+@app.callback(
+    [Output('user-grid', 'rowTransaction', allow_duplicate=True),
+     Output('team-grid', 'rowTransaction', allow_duplicate=True),
+     Output('add-user-output', 'children', allow_duplicate=True),
+     Output('grid-versions', 'data', allow_duplicate=True),
+     Output('bulk-import-upload', 'contents')],
+    Input('bulk-import-upload', 'contents'),
+    [State('bulk-import-upload', 'filename'),
+     State('bulk-import-kind', 'value'),
+     State('grid-versions', 'data')],
+    prevent_initial_call=True
+)
+def import_permissions(contents, filename, kind, versions):
+    """Validate an uploaded file of pairs in one query and insert the new ones with batched MERGEs."""
+    no_update = dash.no_update
+    if not contents:
+        return no_update, no_update, no_update, no_update, no_update
+    try:
+        pairs = bulk_import.parse_upload(contents, filename or '', kind)
+        checked = bulk_import.validate(kind, pairs)
+        new_pairs = checked[checked['status'] == 'new']
+        added = columnar.to_records(bulk_import.apply(kind, new_pairs)) if len(new_pairs) else []
+        index = current_access_index()
+        if index is not None:
+            index.apply_extension_changes(kind, rows=added)
+
+        versions = dict(versions or {})
+        if kind in versions and added:
+            versions[kind] = note_own_changes(versions[kind], added=added)
+        transaction = {'add': added} if added else no_update
+
+        existing = int((checked['status'] == 'exists').sum())
+        invalid = checked[checked['status'].str.startswith('unknown')]
+        message = [html.Div(f"Imported {len(added)} permission(s) from {filename}. "
+                            f"Skipped {existing} already present and {len(invalid)} with unknown users or teams.")]
+        if len(invalid):
+            message.append(html.Ul([
+                html.Li(f"{' → '.join(str(row[col]) for col in bulk_import.IMPORT_KINDS[kind]['columns'])}: {row['status']}")
+                for _, row in invalid.head(10).iterrows()
+            ]))
+        alert = dbc.Alert(message, color="success" if not len(invalid) else "warning")
+        if kind == 'user':
+            return transaction, no_update, alert, versions, None
+        return no_update, transaction, alert, versions, None
+    except Exception as e:
+        print(f"An error occurred while importing permissions: {str(e)}")
+        return no_update, no_update, dbc.Alert(f"An error occurred while importing permissions: {str(e)}", color="danger"), no_update, None
+
+@app.callback(
+    [Output('effective-access-grid', 'columnDefs'),
+     Output('effective-access-grid', 'rowData')],
+    [Input('effective-access-input', 'value'),
+     Input('effective-access-mode', 'value')]
+)
+def show_effective_access(value, mode):
+    """Answer effective-access lookups from the in-memory access index."""
+    if not value:
+        return [], []
+    try:
+        index = get_access_index()
+        if mode == 'team':
+            rows = index.team_viewers(value.strip())
         else:
-            return user_grid_data, team_grid_data, dbc.Alert("No row selected for deletion.", color="warning")
+            rows = index.effective_permissions(value.strip())
+        fields = ['User', 'Source'] if mode == 'team' else ['TeamName', 'Source', 'Mandates']
+        return [{"headerName": field, "field": field} for field in fields], rows
+    except Exception as e:
+        print(f"An error occurred while looking up effective access: {str(e)}")
+        return [], []
+
+# Build rowData from the columnar payloads in the browser rather than on the server
+for grid_id in ('user-grid', 'team-grid'):
+    app.clientside_callback(
+        columnar.ROWS_FROM_COLUMNS_JS,
+        Output(grid_id, 'rowData'),
+        Input(f'{grid_id}-columns', 'data')
+    )
 
-    return user_grid_data, team_grid_data, None
+app.clientside_callback(
+    columnar.ROWS_FROM_KEYED_COLUMNS_JS,
+    Output('data-grid', 'rowData'),
+    [Input('data-grid-tab', 'data'),
+     Input('tab-data', 'data')]
+)
 
 @app.callback(
     Output("info-modal", "is_open"),
@@ -451,5 +908,17 @@ def toggle_info_modal(info_click, close_click, is_open):
         return not is_open
     return is_open
 
+def warm_up_warehouse():
+    with startup.phase('warehouse warm-up'):
+        db.warm_up()
+
+# Connect in the background: the first page does not need the warehouse, the first table does
+warm_up_thread = threading.Thread(target=warm_up_warehouse, name='warehouse-warm-up', daemon=True)
+warm_up_thread.start()
+if SQL_BACKEND == 'duckdb':
+    # A daemon thread still inside DuckDB (seeding the local backend) aborts the interpreter at exit.
+    # Not for the warehouse: exit must not wait on a connect to a warehouse that is still resuming.
+    atexit.register(warm_up_thread.join)
+
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)  # Local development only; production runs under gunicorn
\ No newline at end of file
@@ -0,0 +1,230 @@
+import os
+import threading
+
+import pyarrow as pa
+
+# 'databricks' talks to the SQL warehouse; 'duckdb' runs everything against a local, seeded stand-in
+SQL_BACKEND = os.getenv('SQL_BACKEND', 'databricks')
+LOCAL_DB_PATH = os.getenv('LOCAL_DB_PATH', ':memory:')
+LOCAL_SEED_ROWS = int(os.getenv('LOCAL_SEED_ROWS', '10000'))
+
+
+class Backend:
+    """What sqlQuery needs from a SQL engine: DB-API style connections and literal quoting.
+
+    Connections must provide ``cursor()``; cursors must be context managers with
+    ``execute``, ``fetchall``, ``fetchall_arrow`` and ``cancel``.
+    """
+
+    name = None
+    # Exceptions meaning the session was gone before the statement ran, so any statement can be retried
+    session_errors = ()
+    # Connection-level failures: the connection is discarded and reads are retried once
+    transient_errors = ()
+
+    def connect(self):
+        raise NotImplementedError
+
+    def literal(self, text: str) -> str:
+        """Quote a string as a SQL literal in this engine's dialect."""
+        raise NotImplementedError
+
+
+class DatabricksBackend(Backend):
+    name = 'databricks'
+
+    def __init__(self):
+        assert os.getenv('DATABRICKS_WAREHOUSE_ID'), "DATABRICKS_WAREHOUSE_ID must be set in app.yaml."
+        self._config = None
+        self._config_lock = threading.Lock()
+
+    @property
+    def session_errors(self):
+        from databricks.sql.exc import CursorAlreadyClosedError, SessionAlreadyClosedError
+        return (SessionAlreadyClosedError, CursorAlreadyClosedError)
+
+    @property
+    def transient_errors(self):
+        from databricks.sql.exc import InterfaceError, OperationalError
+        return (OperationalError, InterfaceError)
+
+    def get_config(self):
+        """Return the SDK Config so credentials are only resolved once per process.
+
+        The SDK and connector are imported here rather than at module load; together they
+        are most of the app's import time.
+        """
+        if self._config is None:
+            with self._config_lock:
+                if self._config is None:
+                    from databricks.sdk.core import Config
+                    self._config = Config()  # Pull environment variables for auth
+        return self._config
+
+    def connect(self):
+        from databricks import sql
+        cfg = self.get_config()
+        return sql.connect(
+            server_hostname=cfg.host,
+            http_path=f"/sql/1.0/warehouses/{os.getenv('DATABRICKS_WAREHOUSE_ID')}",
+            credentials_provider=lambda: cfg.authenticate
+        )
+
+    def literal(self, text: str) -> str:
+        return "'" + text.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+class DuckDBCursor:
+    """Adapts a DuckDB connection to the subset of the Databricks cursor API the app uses."""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, query, parameters=None):
+        self._connection.execute(query, parameters)
+        self._reader = None
+        return self
+
+    def fetchall(self):
+        return self._connection.fetchall()
+
+    def fetchall_arrow(self) -> pa.Table:
+        return self._connection.to_arrow_table()
+
+    def fetchmany_arrow(self, size) -> pa.Table:
+        """Return the next ``size`` rows, or an empty table once the result is exhausted."""
+        if self._reader is None:
+            self._reader = self._connection.fetch_record_batch(size)
+        try:
+            return pa.Table.from_batches([self._reader.read_next_batch()])
+        except StopIteration:
+            return self._reader.schema.empty_table()
+
+    def cancel(self):
+        self._connection.interrupt()
+
+    def close(self):
+        pass
+
+
+class DuckDBConnection:
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self):
+        return DuckDBCursor(self._connection.cursor())
+
+    def close(self):
+        self._connection.close()
+
+
+class DuckDBBackend(Backend):
+    """Local stand-in for the warehouse, seeded with synthetic access-model tables."""
+
+    name = 'duckdb'
+
+    def __init__(self, path=LOCAL_DB_PATH, seed_rows=LOCAL_SEED_ROWS):
+        import duckdb
+        self.path = path
+        self._root = duckdb.connect(path)
+        if seed_rows:
+            seed(self._root, seed_rows)
+
+    def connect(self):
+        return DuckDBConnection(self._root.cursor())  # A new connection to the same database
+
+    def literal(self, text: str) -> str:
+        return "'" + text.replace("'", "''") + "'"
+
+
+def seed(connection, users: int):
+    """Create the gold and extension tables and fill them with ``users`` synthetic users.
+
+    Teams scale at one per 100 users, each user belongs to two teams, each team carries
+    mandates so bridgemandateteamaccess has about as many rows as dimreportuser, and the
+    extension tables hold one row per ten users.
+    """
+    teams = max(users // 100, 10)
+    extensions = max(users // 10, 1)
+    for catalog, schema in (('minerva_prod', 'goldaccessmodel'), ('minerva_dev', 'accessmodel')):
+        if not connection.execute(f"SELECT 1 FROM duckdb_databases() WHERE database_name = '{catalog}'").fetchall():
+            connection.execute(f"ATTACH ':memory:' AS {catalog}")
+        connection.execute(f"CREATE SCHEMA IF NOT EXISTS {catalog}.{schema}")
+
+    gold, ext = 'minerva_prod.goldaccessmodel', 'minerva_dev.accessmodel'
+    connection.execute(f"""
+        CREATE OR REPLACE TABLE {gold}.dimreportuser AS
+        SELECT i AS UserKey, 100000 + i AS EmployeeNumber, 'user' || i || '@example.com' AS internalemailaddress,
+               'User ' || i AS fullname
+        FROM range({users}) AS t(i)
+    """)
+    connection.execute(f"""
+        CREATE OR REPLACE TABLE {gold}.teamgrouping AS
+        SELECT i AS TeamGroupingKey, 'Team ' || i AS TeamName, 'Office ' || (i % 20) AS Office, 'City ' || (i % 7) AS City
+        FROM range({teams}) AS t(i)
+    """)
+    connection.execute(f"""
+        CREATE OR REPLACE TABLE {gold}.bridgeuserteam AS
+        SELECT i AS UserKey, (i * 7 + k) % {teams} AS TeamGroupingKey
+        FROM range({users}) AS t(i), range(2) AS r(k)
+    """)
+    connection.execute(f"""
+        CREATE OR REPLACE TABLE {gold}.bridgemandateteamaccess AS
+        SELECT i % {teams} AS TeamGroupingKey, 5000 + i AS MandateKey, CASE WHEN i % 3 = 0 THEN 'Read' ELSE 'Write' END AS AccessLevel
+        FROM range({users}) AS t(i)
+    """)
+    # Extension ids come from a sequence, as the warehouse's identity columns do (migrations/001)
+    for table, columns in (('managerworkerextension', 'manager_name VARCHAR, worker_name VARCHAR'),
+                           ('userteamextension', 'worker_name VARCHAR, team_name VARCHAR')):
+        connection.execute(f"DROP TABLE IF EXISTS {ext}.{table}")
+        connection.execute(f"CREATE OR REPLACE SEQUENCE {ext}.{table}_id START {extensions + 1}")
+        connection.execute(f"CREATE TABLE {ext}.{table} (id BIGINT DEFAULT nextval('{ext}.{table}_id'), {columns}, timestamp TIMESTAMP)")
+    connection.execute(f"CREATE OR REPLACE TABLE {ext}.extensiontombstone (table_name VARCHAR, row_id BIGINT, deleted_at TIMESTAMP)")
+    connection.execute(f"""
+        INSERT INTO {ext}.managerworkerextension
+        SELECT i + 1 AS id, 'user' || (i * 13 % {users}) || '@example.com' AS manager_name,
+               'user' || ((i * 13 + 1) % {users}) || '@example.com' AS worker_name,
+               TIMESTAMP '2024-01-01' + to_seconds(i) AS timestamp
+        FROM range({extensions}) AS t(i)
+    """)
+    connection.execute(f"""
+        INSERT INTO {ext}.userteamextension
+        SELECT i + 1 AS id, 'user' || (i * 17 % {users}) || '@example.com' AS worker_name,
+               'Team ' || (i % {teams}) AS team_name, TIMESTAMP '2024-01-01' + to_seconds(i) AS timestamp
+        FROM range({extensions}) AS t(i)
+    """)
+
+
+BACKENDS = {
+    'databricks': DatabricksBackend,
+    'duckdb': DuckDBBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> Backend:
+    """Return the process-wide backend selected by SQL_BACKEND."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if SQL_BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown SQL_BACKEND '{SQL_BACKEND}'; expected one of {', '.join(BACKENDS)}.")
+                _backend = BACKENDS[SQL_BACKEND]()
+    return _backend
+
+
+def set_backend(backend: Backend):
+    """Swap the backend, e.g. to re-seed the local engine at a different scale in benchmarks."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
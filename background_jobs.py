@@ -0,0 +1,97 @@
+import importlib
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from multiprocessing import forkserver
+
+import diskcache
+import psutil
+from dash import DiskcacheManager
+
+import query_batch
+
+# Background callback settings, overridable from app.yaml
+BACKGROUND_CALLBACKS = os.getenv('BACKGROUND_CALLBACKS', 'true').lower() in ('1', 'true', 'yes')
+BACKGROUND_CACHE_DIR = os.getenv('BACKGROUND_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'accessmodel-jobs'))
+BACKGROUND_POLL_INTERVAL = int(os.getenv('BACKGROUND_POLL_INTERVAL', '250'))  # Milliseconds between result polls
+TERMINATE_GRACE = float(os.getenv('BACKGROUND_TERMINATE_GRACE', '2'))  # Seconds a superseded job gets to cancel its queries
+
+# Imported once by the job runner, so a job starts without importing them again; the app itself is not among them
+JOB_MODULES = ['background_jobs', 'tabs']
+
+# A background callback by import path, which is all a job process needs to find it
+Job = namedtuple('Job', 'module name progress')
+
+
+def run_job(job: Job, cache_dir: str, key: str, progress_key: str, args, context):
+    """Body of a job process: run one background callback and leave its result in the cache for polling."""
+    signal.signal(signal.SIGTERM, query_batch.cancel_and_exit)  # A superseded job cancels its statements first
+    fn = getattr(importlib.import_module(job.module), job.name)
+    DiskcacheManager(diskcache.Cache(cache_dir)).make_job_fn(fn, job.progress)(key, progress_key, args, context)
+
+
+class JobManager(DiskcacheManager):
+    """Runs background callbacks in separate processes, with results in a disk cache shared by all workers.
+
+    Jobs are not forked from the gunicorn worker: its request, pool and refresh threads may
+    hold locks (the connection pool's, DuckDB's, SQLite's) that a forked copy could never
+    release. They are forked by multiprocessing's forkserver instead, a fresh, single-threaded
+    process that has imported JOB_MODULES, so a job starts with what it needs already imported.
+
+    Dash kills a job when the user re-triggers its callback (e.g. switches tabs mid-load) or
+    presses one of its cancel inputs. We send SIGTERM first so the job can cancel its
+    warehouse statements (see query_batch), and only then fall back to Dash's SIGKILL.
+    """
+
+    def make_job_fn(self, fn, progress, key=None):
+        return Job(fn.__module__, fn.__name__, progress)
+
+    def call_job_fn(self, key, job_fn, args, context):
+        process = multiprocessing.get_context('forkserver').Process(
+            target=run_job, args=(job_fn, self.handle.directory, key, self._make_progress_key(key), args, context))
+        process.start()
+        return process.pid
+
+    def terminate_job(self, job):
+        if job is None:
+            return
+        try:
+            os.kill(int(job), signal.SIGTERM)
+        except (ProcessLookupError, ValueError):
+            return
+        deadline = time.monotonic() + TERMINATE_GRACE
+        while time.monotonic() < deadline and self.job_running(job):
+            time.sleep(0.05)
+        try:
+            super().terminate_job(job)
+        except psutil.NoSuchProcess:
+            pass  # Exited between Dash's checks
+
+    def job_running(self, job):
+        try:
+            return super().job_running(job)
+        except psutil.NoSuchProcess:
+            return False  # Exited between Dash's checks
+
+
+def callback_manager(needed: bool = True):
+    """Return the background callback manager, or None when background callbacks are disabled or unused.
+
+    The job runner is started in the background, so the first job does not wait for its imports.
+    """
+    if not (BACKGROUND_CALLBACKS and needed):
+        return None
+    forkserver.set_forkserver_preload(JOB_MODULES)
+    threading.Thread(target=forkserver.ensure_running, name='job-runner-start', daemon=True).start()
+    return JobManager(diskcache.Cache(BACKGROUND_CACHE_DIR))
+
+
+def options(needed: bool = True, **kwargs) -> dict:
+    """Keyword arguments that make a callback run in the background when it is enabled."""
+    if not (BACKGROUND_CALLBACKS and needed):
+        return {}
+    return {'background': True, 'interval': BACKGROUND_POLL_INTERVAL, **kwargs}
@@ -0,0 +1,158 @@
+"""Benchmark the Dash callbacks against the local DuckDB stand-in backend.
+
+Usage: python benchmark.py --scales 10000 100000 1000000 --repeat 5 [--json results.json]
+
+Each scenario posts a real _dash-update-component request through the Flask test
+client and reports cold latency (empty query cache), median warm latency, response
+payload size and the peak memory of an uncached request: Arrow buffers from the default memory pool (where query
+results live) and the growth of the process RSS, which also covers DuckDB and pandas.
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+
+os.environ.setdefault('SQL_BACKEND', 'duckdb')
+os.environ.setdefault('LOCAL_SEED_ROWS', '0')  # Seeded per scale below
+os.environ.setdefault('SNAPSHOT_ENABLED', 'false')  # Snapshots would outlive the re-seeded backend
+os.environ.setdefault('BACKGROUND_CALLBACKS', 'false')  # Time the callbacks themselves, not job polling
+
+import psutil
+import pyarrow as pa
+
+import app as access_app
+import access_index
+import backends
+import db
+import search_index
+from dash_requests import callback_body
+
+EMAIL = 'user1@example.com'
+FIRST_BLOCK = {'startRow': 0, 'endRow': 100, 'sortModel': [], 'filterModel': {}}
+SORTED_FILTERED_BLOCK = {
+    'startRow': 100, 'endRow': 200,
+    'sortModel': [{'colId': 'EmailAddress', 'sort': 'desc'}],
+    'filterModel': {'EmailAddress': {'filterType': 'text', 'type': 'contains', 'filter': '7'}},
+}
+
+
+def scenarios():
+    """(name, settings, callback, values, changed) for every benchmarked interaction."""
+    tab = lambda value: {'tabs.value': value, 'email-store.data': EMAIL}
+    rows = lambda value, block: {'data-grid.getRowsRequest': block, 'tabs.value': value, 'email-store.data': EMAIL}
+    result = []
+    for value, label in (('tab1', 'Report Users'), ('tab2', 'Team Grouping'), ('tab3', 'Bridge Mandate Team Access'), ('tab4', 'My Team Permissions')):
+        result.append((f"render_table {label} (clientSide)", {'GRID_ROW_MODEL': 'clientSide'}, 'render_table', tab(value), ['tabs.value']))
+        result.append((f"load_tab_data {label}", {}, 'load_tab_data', {
+            'tab-load.data': {'tab': value, 'version': None}, 'email-store.data': EMAIL
+        }, ['tab-load.data']))
+        result.append((f"render_table {label} (infinite)", {'GRID_ROW_MODEL': 'infinite'}, 'render_table', tab(value), ['tabs.value']))
+        result.append((f"load_grid_rows {label} first block", {}, 'load_grid_rows', rows(value, FIRST_BLOCK), ['data-grid.getRowsRequest']))
+    result.append(("load_grid_rows Report Users sorted+filtered", {}, 'load_grid_rows', rows('tab1', SORTED_FILTERED_BLOCK), ['data-grid.getRowsRequest']))
+    result.append(("manage_grids page load", {}, 'manage_grids', {'main-layout.children': []}, ['main-layout.children']))
+    result.append(("manage_grids add manager->worker", {}, 'manage_grids', {
+        'add-access-user-btn.n_clicks': 1,
+        'manager-user-dropdown.value': 'user2@example.com',
+        'worker-user-dropdown.value': 'user3@example.com',
+    }, ['add-access-user-btn.n_clicks']))
+    result.append(("populate dropdowns (full)", {'DROPDOWN_MODE': 'full'}, 'populate_team_dropdowns', {'add-user-link.n_clicks': 1}, ['add-user-link.n_clicks']))
+    result.append(("populate dropdowns (search)", {'DROPDOWN_MODE': 'search'}, 'populate_team_dropdowns', {'add-user-link.n_clicks': 1}, ['add-user-link.n_clicks']))
+    result.append(("effective access lookup", {}, 'show_effective_access', {
+        'effective-access-input.value': EMAIL, 'effective-access-mode.value': 'user'
+    }, ['effective-access-input.value']))
+    result.append(("dropdown search 'user12'", {'DROPDOWN_MODE': 'search'}, ('update_options', 'manager-user-dropdown'), {
+        'manager-user-dropdown.search_value': 'user12'
+    }, ['manager-user-dropdown.search_value']))
+    return result
+
+
+def post(client, body):
+    started = time.perf_counter()
+    response = client.post('/_dash-update-component', json=body)
+    elapsed = time.perf_counter() - started
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"{body['output']} returned {response.status_code}: {response.data[:200]!r}")
+    return elapsed, len(response.data)
+
+
+def measure_peak(fn, interval=0.001):
+    """Run ``fn`` while sampling Arrow allocations and RSS; return their peak growth in bytes.
+
+    The Arrow pool only reports a lifetime maximum, so the current allocation is polled instead.
+    """
+    process = psutil.Process()
+    base_arrow, base_rss = pa.total_allocated_bytes(), process.memory_info().rss
+    peak = {'arrow': base_arrow, 'rss': base_rss}
+    done = threading.Event()
+
+    def sample():
+        while True:
+            peak['arrow'] = max(peak['arrow'], pa.total_allocated_bytes())
+            peak['rss'] = max(peak['rss'], process.memory_info().rss)
+            if done.wait(interval):
+                break
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        fn()
+    finally:
+        done.set()
+        sampler.join()
+    return peak['arrow'] - base_arrow, peak['rss'] - base_rss
+
+
+def run_scenario(client, name, settings, callback, values, changed, repeat):
+    for key, value in settings.items():
+        setattr(access_app, key, value)
+    # Callbacks registered in a loop share a name and are picked out by component id
+    callback, component_id = callback if isinstance(callback, tuple) else (callback, None)
+    body = callback_body(access_app.app, callback, values, changed, component_id)
+    db.query_cache.clear()
+    search_index.reset()
+    cold, payload = post(client, body)
+    warm = [post(client, body)[0] for _ in range(max(repeat - 1, 1))]
+
+    db.query_cache.clear()  # So the measured request fetches its results again
+    peak_arrow, peak_rss = measure_peak(lambda: post(client, body))
+    return {
+        'scenario': name,
+        'cold_ms': round(cold * 1000, 1),
+        'warm_ms': round(statistics.median(warm) * 1000, 1),
+        'payload_kb': round(payload / 1024, 1),
+        'peak_arrow_mb': round(peak_arrow / 1024 / 1024, 1),
+        'peak_rss_mb': round(peak_rss / 1024 / 1024, 1),
+    }
+
+
+def run(scales, repeat):
+    client = access_app.app.server.test_client()
+    results = []
+    for scale in scales:
+        started = time.perf_counter()
+        backends.set_backend(backends.DuckDBBackend(seed_rows=scale))
+        db.reset()
+        access_index.reset()
+        search_index.reset()
+        print(f"\nSeeded {scale:,} users in {time.perf_counter() - started:.1f}s")
+        print(f"{'scenario':<56}{'cold ms':>10}{'warm ms':>10}{'payload KB':>12}{'arrow MB':>10}{'RSS MB':>10}")
+        for name, settings, callback, values, changed in scenarios():
+            result = run_scenario(client, name, settings, callback, values, changed, repeat)
+            result['scale'] = scale
+            results.append(result)
+            print(f"{result['scenario']:<56}{result['cold_ms']:>10}{result['warm_ms']:>10}{result['payload_kb']:>12}{result['peak_arrow_mb']:>10}{result['peak_rss_mb']:>10}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000], help='Number of synthetic users to seed')
+    parser.add_argument('--repeat', type=int, default=5, help='Requests per scenario')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+    results = run(args.scales, args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,129 @@
+import base64
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+from db import arrowQuery, sql_literal, sqlQuery
+from migrate import require_identity_ids
+
+BULK_CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', '1000'))  # Pairs per MERGE statement
+
+DIM_REPORT_USER = "minerva_prod.goldaccessmodel.dimreportuser"
+TEAM_GROUPING = "minerva_prod.goldaccessmodel.teamgrouping"
+
+# What each kind of import writes to and which reference table validates each column
+IMPORT_KINDS = {
+    'user': {
+        'table': "minerva_dev.accessmodel.managerworkerextension",
+        'columns': ('manager_name', 'worker_name'),
+        'references': {
+            'manager_name': (DIM_REPORT_USER, 'internalemailaddress'),
+            'worker_name': (DIM_REPORT_USER, 'internalemailaddress'),
+        },
+    },
+    'team': {
+        'table': "minerva_dev.accessmodel.userteamextension",
+        'columns': ('worker_name', 'team_name'),
+        'references': {
+            'worker_name': (DIM_REPORT_USER, 'internalemailaddress'),
+            'team_name': (TEAM_GROUPING, 'TeamName'),
+        },
+    },
+}
+
+# Header spellings accepted in uploaded files, mapped to extension table columns
+COLUMN_ALIASES = {
+    'manager': 'manager_name',
+    'manager_email': 'manager_name',
+    'manager_user': 'manager_name',
+    'worker': 'worker_name',
+    'worker_email': 'worker_name',
+    'worker_user': 'worker_name',
+    'team': 'team_name',
+    'teamname': 'team_name',
+}
+
+
+def parse_upload(contents: str, filename: str, kind: str) -> pd.DataFrame:
+    """Decode a dcc.Upload CSV/Excel file into a frame of (trimmed, de-duplicated) pairs."""
+    columns = list(IMPORT_KINDS[kind]['columns'])
+    _, encoded = contents.split(',', 1)
+    data = base64.b64decode(encoded)
+    if filename.lower().endswith('.xlsx'):
+        frame = pd.read_excel(io.BytesIO(data), dtype=str)
+    else:
+        frame = pd.read_csv(io.BytesIO(data), dtype=str)
+
+    normalized = {}
+    for col in frame.columns:
+        name = str(col).strip().lower().replace(' ', '_')
+        normalized[col] = COLUMN_ALIASES.get(name, name)
+    frame = frame.rename(columns=normalized)
+    missing = [col for col in columns if col not in frame.columns]
+    if missing:
+        raise ValueError(f"The file is missing the column(s): {', '.join(missing)}.")
+
+    frame = frame[columns].dropna().apply(lambda col: col.str.strip())
+    frame = frame[(frame != '').all(axis=1)]
+    return frame.drop_duplicates().reset_index(drop=True)
+
+
+def _values_table(kind: str, pairs: pd.DataFrame) -> str:
+    columns = IMPORT_KINDS[kind]['columns']
+    rows = ', '.join('(' + ', '.join(sql_literal(value) for value in row) + ')' for row in pairs[list(columns)].itertuples(index=False))
+    return f"(VALUES {rows}) AS incoming({', '.join(columns)})"
+
+
+def validate(kind: str, pairs: pd.DataFrame) -> pd.DataFrame:
+    """Check every pair against the reference tables and the existing rows in one query.
+
+    Returns the pairs with a ``status`` column: 'new', 'exists' or 'unknown <column>'.
+    """
+    if pairs.empty:
+        return pairs.assign(status=pd.Series(dtype=str))
+    spec = IMPORT_KINDS[kind]
+    columns = spec['columns']
+    joins, checks = [], []
+    for i, col in enumerate(columns):
+        ref_table, ref_col = spec['references'][col]
+        joins.append(f"LEFT JOIN (SELECT DISTINCT {ref_col} AS value FROM {ref_table}) AS ref{i} ON ref{i}.value = incoming.{col}")
+        checks.append(f"WHEN ref{i}.value IS NULL THEN 'unknown {col}'")
+    match = ' AND '.join(f"existing.{col} = incoming.{col}" for col in columns)
+    query = f"""
+        SELECT {', '.join(f'incoming.{col}' for col in columns)},
+               CASE {' '.join(checks)} WHEN existing.{columns[0]} IS NOT NULL THEN 'exists' ELSE 'new' END AS status
+        FROM {_values_table(kind, pairs)}
+        {' '.join(joins)}
+        LEFT JOIN (SELECT DISTINCT {', '.join(columns)} FROM {spec['table']}) AS existing ON {match}
+    """
+    return sqlQuery(query, use_cache=False)
+
+
+def apply(kind: str, pairs: pd.DataFrame) -> pa.Table:
+    """Insert new pairs with batched MERGE statements and return the inserted rows as an Arrow table.
+
+    Ids come from the tables' identity columns (migrations/001), and the MERGE skips pairs
+    that another user inserted in the meantime.
+    """
+    spec = IMPORT_KINDS[kind]
+    table, columns = spec['table'], spec['columns']
+    require_identity_ids(table)
+    match = ' AND '.join(f"target.{col} = source.{col}" for col in columns)
+    inserted = []
+    for start in range(0, len(pairs), BULK_CHUNK_SIZE):
+        chunk = pairs.iloc[start:start + BULK_CHUNK_SIZE]
+        values = _values_table(kind, chunk)
+        sqlQuery(f"""
+            MERGE INTO {table} AS target
+            USING (SELECT {', '.join(columns)} FROM {values}) AS source
+            ON {match}
+            WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}, timestamp)
+                VALUES ({', '.join(f'source.{col}' for col in columns)}, CURRENT_TIMESTAMP)
+        """)
+        inserted.append(arrowQuery(f"""
+            SELECT target.* FROM {table} AS target
+            INNER JOIN {values} ON {' AND '.join(f"target.{col} = incoming.{col}" for col in columns)}
+        """, use_cache=False))
+    return pa.concat_tables(inserted) if inserted else pa.table({})
@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import columnar
+from db import arrowQuery, sql_literal
+from query_batch import run_queries
+
+# Change feed settings, overridable from app.yaml
+TOMBSTONE_TABLE = os.getenv('EXTENSION_TOMBSTONE_TABLE', 'minerva_dev.accessmodel.extensiontombstone')
+FEED_POLL_INTERVAL = float(os.getenv('CHANGE_FEED_POLL_INTERVAL', '5'))  # Seconds a poll result is shared by all grids
+FEED_OVERLAP = float(os.getenv('CHANGE_FEED_OVERLAP', '60'))  # Seconds re-read behind the high-water mark for late commits
+FEED_RETENTION = float(os.getenv('CHANGE_FEED_RETENTION', '3600'))  # Grids further behind than this reload in full
+
+NOW_QUERY = "SELECT CURRENT_TIMESTAMP AS now"
+
+_pruned_at = None  # time.monotonic() of this process's last tombstone prune
+_prune_lock = threading.Lock()
+
+
+def _table_name(table: str) -> str:
+    return table.split('.')[-1].lower()
+
+
+def record_deletes(table: str, ids):
+    """Write a tombstone for each deleted row id of an extension table.
+
+    The tombstone table is created by migrations/002. Each DELETE is recorded there, so
+    other sessions can remove the row from their grids.
+    """
+    if not ids:
+        return
+    values = ', '.join(f"({sql_literal(_table_name(table))}, {int(row_id)}, CURRENT_TIMESTAMP)" for row_id in ids)
+    arrowQuery(f"INSERT INTO {TOMBSTONE_TABLE} (table_name, row_id, deleted_at) VALUES {values}")
+    prune_tombstones()
+
+
+def prune_tombstones():
+    """Delete tombstones no feed can read any more, at most once per CHANGE_FEED_RETENTION per process.
+
+    Feeds never look further back than the retention plus the overlap window.
+    """
+    global _pruned_at
+    with _prune_lock:
+        if _pruned_at is not None and time.monotonic() - _pruned_at < FEED_RETENTION:
+            return
+        _pruned_at = time.monotonic()
+    try:
+        arrowQuery(f"DELETE FROM {TOMBSTONE_TABLE} "
+                   f"WHERE deleted_at < CURRENT_TIMESTAMP - INTERVAL {int(FEED_RETENTION + FEED_OVERLAP)} SECONDS")
+    except Exception as e:
+        print(f"An error occurred while pruning tombstones: {str(e)}")
+
+
+def to_datetime(value):
+    """Normalize a warehouse timestamp (or its ISO text) to a naive UTC datetime."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def to_text(value) -> str:
+    """JSON-friendly high-water mark for a dcc.Store."""
+    return to_datetime(value).isoformat(sep=' ')
+
+
+def _literal(value: datetime) -> str:
+    return f"TIMESTAMP '{value.isoformat(sep=' ')}'"
+
+
+class ChangeFeed:
+    """Recent inserts and deletes of one extension table, shared by every grid in the process.
+
+    Each poll reads only rows and tombstones newer than the previous poll (minus an overlap
+    for statements that committed late), so keeping any number of grids current costs one
+    small query per table every FEED_POLL_INTERVAL. Grids keep their own high-water mark
+    and ask for the net changes since it.
+    """
+
+    def __init__(self, table: str):
+        self.table = table
+        self.name = _table_name(table)
+        self._events = {}  # (kind, id, time) -> row (None for deletes)
+        self.log_start = None  # Events at or before this time are not in the log
+        self.polled_to = None  # Warehouse time of the last poll
+        self._polled_at = 0.0
+        self._lock = threading.Lock()
+
+    def poll(self):
+        lower = f"CURRENT_TIMESTAMP - INTERVAL {int(FEED_RETENTION)} SECONDS" if self.polled_to is None \
+            else _literal(self.polled_to - timedelta(seconds=FEED_OVERLAP))
+        queries = {
+            'now': NOW_QUERY,
+            'rows': f"SELECT * FROM {self.table} WHERE timestamp > {lower}",
+            'deletes': f"SELECT row_id, deleted_at FROM {TOMBSTONE_TABLE} "
+                       f"WHERE table_name = {sql_literal(self.name)} AND deleted_at > {lower}",
+        }
+        if self.log_start is None:
+            queries['lower'] = f"SELECT {lower} AS lower"
+        results = run_queries(queries, use_cache=False, arrow=True)
+        now = to_datetime(results['now']['now'][0].as_py())
+        if self.log_start is None:
+            self.log_start = to_datetime(results['lower']['lower'][0].as_py())
+        rows = results['rows']
+        # Event times come from the Arrow columns; the JSON-friendly records only keep whole seconds
+        for row_id, at, row in zip(rows['id'].to_pylist(), rows['timestamp'].to_pylist(), columnar.to_records(rows)):
+            self._events[('insert', int(row_id), to_datetime(at))] = row
+        deletes = results['deletes']
+        for row_id, at in zip(deletes['row_id'].to_pylist(), deletes['deleted_at'].to_pylist()):
+            self._events[('delete', int(row_id), to_datetime(at))] = None
+
+        cutoff = now - timedelta(seconds=FEED_RETENTION)
+        if cutoff > self.log_start:
+            self.log_start = cutoff
+            self._events = {key: row for key, row in self._events.items() if key[2] > cutoff}
+        self.polled_to = now
+        self._polled_at = time.monotonic()
+
+    def changes_since(self, since, own=()):
+        """Net changes after ``since``: rows to add and update, ids to remove, and the new high-water mark.
+
+        ``own`` lists the ``(kind, id)`` events the grid already applied itself: 'insert' for
+        rows it added, 'delete' for rows it removed. Only those events are skipped, so a row
+        this session added and another one deleted is still removed; the own events found
+        are listed under 'skipped'. Returns None when ``since`` is older than the log, in
+        which case the grid should reload. A change that commits later than the overlap
+        allows is missed here; the periodic fingerprint check in manage_grids catches it.
+        """
+        with self._lock:
+            if time.monotonic() - self._polled_at >= FEED_POLL_INTERVAL:
+                self.poll()
+            since = to_datetime(since)
+            if since is None or since < self.log_start:
+                return None
+            by_id = {}
+            for (kind, row_id, at), row in sorted(self._events.items(), key=lambda item: (item[0][2], item[0][0] == 'insert')):
+                if at > since:
+                    by_id.setdefault(row_id, []).append((kind, row))
+            polled_to = self.polled_to
+
+        own = {(kind, int(row_id)) for kind, row_id in own}
+        changes = {'add': [], 'update': [], 'remove': [], 'skipped': [], 'since': to_text(max(polled_to, since))}
+        for row_id, events in by_id.items():
+            shown = events[0][0] == 'delete'  # The first change tells us whether the grid already had the row
+            for kind, _ in events:
+                if (kind, row_id) in own:
+                    shown = kind == 'insert'  # The grid made this change itself
+                    changes['skipped'].append([kind, row_id])
+            kind, row = events[-1]
+            if kind == 'insert' and (kind, row_id) not in own:
+                changes['update' if shown else 'add'].append(row)
+            elif kind == 'delete' and shown:
+                changes['remove'].append(row_id)
+        return changes
+
+    def latest_since(self, since):
+        """The last known state of every row changed after ``since``, and the new high-water mark.
+
+        Returns ``{'rows': {id: row, or None if it was deleted}, 'since': ...}``. Unlike
+        changes_since nothing is netted against what the caller may already hold, so
+        applying the rows by id is idempotent. Returns None when ``since`` is older than the log.
+        """
+        with self._lock:
+            if time.monotonic() - self._polled_at >= FEED_POLL_INTERVAL:
+                self.poll()
+            since = to_datetime(since)
+            if since is None or since < self.log_start:
+                return None
+            rows = {}
+            for (kind, row_id, at), row in sorted(self._events.items(), key=lambda item: (item[0][2], item[0][0] == 'insert')):
+                if at > since:
+                    rows[row_id] = row
+            return {'rows': rows, 'since': max(self.polled_to, since)}
+
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def get_feed(table: str) -> ChangeFeed:
+    """Return the process-wide feed for an extension table."""
+    with _feeds_lock:
+        if table not in _feeds:
+            _feeds[table] = ChangeFeed(table)
+        return _feeds[table]
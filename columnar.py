@@ -0,0 +1,77 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Turns a columnar payload ({'fields', 'columns', 'length'}) back into AG Grid rowData in the browser,
+# so the server never builds one dict per row
+ROWS_FROM_COLUMNS_JS = """
+function(payload) {
+    if (!payload) {
+        return window.dash_clientside.no_update;
+    }
+    const fields = payload.fields, columns = payload.columns, rows = new Array(payload.length);
+    for (let i = 0; i < payload.length; i++) {
+        const row = {};
+        for (let j = 0; j < fields.length; j++) {
+            row[fields[j]] = columns[j][i];
+        }
+        rows[i] = row;
+    }
+    return rows;
+}
+"""
+
+# Same, for one payload out of a dcc.Store that holds several keyed by name (e.g. by tab)
+ROWS_FROM_KEYED_COLUMNS_JS = """
+function(key, payloads) {
+    if (!key || !payloads || !payloads[key]) {
+        return window.dash_clientside.no_update;
+    }
+    return (""" + ROWS_FROM_COLUMNS_JS.strip() + """)(payloads[key]);
+}
+"""
+
+
+def _json_friendly(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Cast types JSON cannot carry cheaply: timestamps/dates to strings, decimals to floats."""
+    kind = column.type
+    if pa.types.is_timestamp(kind):
+        # Whole seconds are all the grid shows, and they keep the strings short
+        return pc.cast(pc.cast(column, pa.timestamp('s', kind.tz), safe=False), pa.string())
+    if pa.types.is_date(kind) or pa.types.is_time(kind):
+        return pc.cast(column, pa.string())
+    if pa.types.is_decimal(kind):
+        return pc.cast(column, pa.float64())
+    if pa.types.is_large_string(kind) or pa.types.is_dictionary(kind):
+        return pc.cast(column, pa.string())
+    return column
+
+
+def prepare(table: pa.Table) -> pa.Table:
+    """Return ``table`` with every column in a type that serializes cheaply to JSON."""
+    return pa.table([_json_friendly(col) for col in table.columns], names=table.column_names)
+
+
+def to_columns(table: pa.Table) -> dict:
+    """Encode a table as compact columnar JSON for a dcc.Store feeding ROWS_FROM_COLUMNS_JS.
+
+    Numeric columns without nulls are passed as numpy arrays, which Dash's JSON encoder
+    serializes in bulk instead of element by element.
+    """
+    table = prepare(table)
+    columns = []
+    for col in table.columns:
+        if (pa.types.is_integer(col.type) or pa.types.is_floating(col.type)) and col.null_count == 0:
+            columns.append(col.to_numpy())
+        else:
+            columns.append(col.to_pylist())
+    return {'fields': table.column_names, 'columns': columns, 'length': table.num_rows}
+
+
+def to_records(table: pa.Table) -> list:
+    """Row dicts straight from Arrow, for small payloads such as grid blocks and row transactions."""
+    return prepare(table).to_pylist()
+
+
+def numeric_fields(table: pa.Table) -> set:
+    """Names of the columns that should get a number filter in the grid."""
+    return {field.name for field in table.schema if pa.types.is_integer(field.type) or pa.types.is_floating(field.type) or pa.types.is_decimal(field.type)}
@@ -0,0 +1,38 @@
+from dash._utils import split_callback_id
+
+
+def find_output(app, callback_name: str, component_id: str = None) -> str:
+    """Return the callback_map key of the callback implemented by ``callback_name``.
+
+    Callbacks registered in a loop share a name, so ``component_id`` picks the one whose
+    outputs include that component.
+    """
+    for output, spec in app.callback_map.items():
+        if getattr(spec.get('callback'), '__name__', None) != callback_name:
+            continue
+        if component_id is None or any(part.split('.')[0] == component_id for part in output.strip('.').split('...')):
+            return output
+    raise KeyError(f"No callback named {callback_name}")
+
+
+def callback_body(app, callback_name: str, values: dict = None, changed=(), component_id: str = None) -> dict:
+    """Build the JSON body the Dash renderer posts to _dash-update-component.
+
+    ``values`` maps 'component-id.property' to the value of each input/state; anything
+    missing is sent as None, like a component that has not set that property yet.
+    """
+    values = values or {}
+    output = find_output(app, callback_name, component_id)
+    spec = app.callback_map[output]
+
+    def props(items):
+        return [{'id': item['id'], 'property': item['property'], 'value': values.get(f"{item['id']}.{item['property']}")}
+                for item in items]
+
+    return {
+        'output': output,
+        'outputs': split_callback_id(output),
+        'inputs': props(spec['inputs']),
+        'state': props(spec['state']),
+        'changedPropIds': list(changed),
+    }
@@ -0,0 +1,360 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+from backends import get_backend
+import metrics
+import snapshot
+from query_cache import query_cache, query_tables, write_target
+
+# Pool settings, overridable from app.yaml
+POOL_SIZE = int(os.getenv('SQL_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.getenv('SQL_POOL_TIMEOUT', '30'))  # Seconds to wait for a free connection
+POOL_IDLE_TIMEOUT = float(os.getenv('SQL_POOL_IDLE_TIMEOUT', '600'))  # Close connections idle for longer than this
+POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('SQL_POOL_HEALTH_CHECK_INTERVAL', '60'))  # Ping idle connections older than this
+# Streamed reads (downloads) get their own connections, at most this many at a time per process
+STREAM_CONNECTIONS = int(os.getenv('SQL_STREAM_CONNECTIONS', '2'))
+STREAM_TIMEOUT = float(os.getenv('SQL_STREAM_TIMEOUT', '5'))  # Seconds to wait for a free stream slot
+
+READ_STATEMENTS = ('SELECT', 'WITH', 'SHOW', 'DESCRIBE')
+
+def connect():
+    """Open a new connection through the configured SQL backend."""
+    return get_backend().connect()
+
+
+def is_read_query(query: str) -> bool:
+    """Return True if the statement only reads data."""
+    words = query.split(None, 1)
+    return bool(words) and words[0].upper() in READ_STATEMENTS
+
+
+def sql_literal(value) -> str:
+    """Render a Python value as a SQL literal for interpolation into a statement."""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return get_backend().literal(str(value))
+
+
+class PooledConnection:
+    """A warehouse connection plus the bookkeeping the pool needs."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+
+    def is_healthy(self) -> bool:
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            self.last_checked = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived warehouse connections.
+
+    Idle connections are health-checked before reuse and closed once they have
+    been idle for longer than ``idle_timeout``.
+    """
+
+    def __init__(self, connect_fn, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 idle_timeout=POOL_IDLE_TIMEOUT, health_check_interval=POOL_HEALTH_CHECK_INTERVAL):
+        self._connect = connect_fn
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = []  # Most recently used last, so warm connections get reused first
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._in_use = 0
+        self._created = 0
+        self._closed = 0
+        self._reaper = None
+
+    def acquire(self) -> PooledConnection:
+        """Borrow a connection, opening a new one if none are idle."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No SQL connection became available within {self.timeout} seconds.")
+        try:
+            pooled = self._take_idle()
+            if pooled is None:
+                pooled = PooledConnection(self._connect())
+                with self._lock:
+                    self._created += 1
+            with self._lock:
+                self._in_use += 1
+            self._start_reaper()
+            return pooled
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, pooled: PooledConnection, discard: bool = False):
+        """Return a borrowed connection; broken connections should be discarded."""
+        with self._lock:
+            self._in_use -= 1
+            if not discard:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+        if discard:
+            self._close(pooled)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a ``with`` block."""
+        pooled = self.acquire()
+        try:
+            yield pooled.connection
+        except get_backend().transient_errors:
+            self.release(pooled, discard=True)
+            raise
+        except BaseException:
+            self.release(pooled)
+            raise
+        else:
+            self.release(pooled)
+
+    def evict_idle(self):
+        """Close connections that have been idle for longer than the idle timeout."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [p for p in self._idle if now - p.last_used > self.idle_timeout]
+            self._idle = [p for p in self._idle if now - p.last_used <= self.idle_timeout]
+        for pooled in expired:
+            self._close(pooled)
+
+    def close_all(self):
+        """Close every idle connection, e.g. on shutdown or after a fork."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'created': self._created,
+                'closed': self._closed,
+            }
+
+    def _take_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                pooled = self._idle.pop()
+            now = time.monotonic()
+            if now - pooled.last_used > self.idle_timeout:
+                self._close(pooled)
+            elif now - pooled.last_checked > self.health_check_interval and not pooled.is_healthy():
+                self._close(pooled)
+            else:
+                return pooled
+
+    def _close(self, pooled):
+        pooled.close()
+        with self._lock:
+            self._closed += 1
+
+    def _start_reaper(self):
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=self._reap, name='sql-pool-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(max(self.idle_timeout / 2, 1))
+            self.evict_idle()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(connect)
+    return _pool
+
+
+def warm_up():
+    """Resolve credentials and open the first pooled session before a user asks for data.
+
+    Run from a background thread at startup, so the app can serve its first page meanwhile.
+    """
+    try:
+        with get_pool().connection():
+            pass
+    except Exception as e:
+        print(f"Warehouse warm-up failed; the first query will connect instead: {str(e)}")
+
+
+def reset():
+    """Close pooled connections and drop cached results, e.g. after switching backends."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = None
+    query_cache.clear()
+
+
+def _execute(query: str, on_cursor=None) -> pa.Table:
+    started = time.perf_counter()
+    try:
+        with get_pool().connection() as connection:
+            connected = time.perf_counter()
+            with connection.cursor() as cursor:
+                if on_cursor is not None:
+                    on_cursor(cursor)  # Lets callers cancel the statement from another thread
+                cursor.execute(query)
+                executed = time.perf_counter()
+                result = cursor.fetchall_arrow()
+                fetched = time.perf_counter()
+    except Exception:
+        metrics.query_errors.inc(metrics.query_label(query))
+        raise
+    metrics.observe_query(query, connected - started, executed - connected, fetched - executed, result.num_rows, result.nbytes)
+    return result
+
+
+def _execute_with_retry(query: str, on_cursor=None) -> pa.Table:
+    try:
+        return _execute(query, on_cursor)
+    except get_backend().session_errors:
+        # The session was dropped before the statement ran, so it is safe to retry on a fresh connection
+        return _execute(query, on_cursor)
+    except get_backend().transient_errors:
+        if not is_read_query(query):
+            raise
+        return _execute(query, on_cursor)
+
+
+def _run(query: str, use_cache: bool, on_cursor, fmt: str):
+    convert = (lambda table: table) if fmt == 'arrow' else (lambda table: table.to_pandas())
+    if not is_read_query(query):
+        try:
+            return convert(_execute_with_retry(query, on_cursor))
+        finally:
+            target = write_target(query)
+            query_cache.invalidate_tables([target] if target else query_tables(query))
+
+    if use_cache:
+        if snapshot.serves(query):
+            return convert(snapshot.get_snapshot().query(query))
+        cached = query_cache.get(query, fmt)
+        if cached is not None:
+            return cached
+    generation = query_cache.generation(query)
+    result = convert(_execute_with_retry(query, on_cursor))
+    if use_cache:
+        query_cache.put(query, result, generation, fmt)
+    return result
+
+
+def sqlQuery(query: str, use_cache: bool = True, on_cursor=None) -> 'pandas.DataFrame':
+    """Execute a SQL query on a pooled connection and return the result as a pandas DataFrame.
+
+    Reads of the slowly changing gold tables are answered from the local snapshot, and
+    other reads from the shared query cache when possible; ``use_cache=False`` always
+    goes to the warehouse. Writes invalidate the cached results of the table they modify.
+    """
+    return _run(query, use_cache, on_cursor, 'pandas')
+
+
+def arrowQuery(query: str, use_cache: bool = True, on_cursor=None) -> pa.Table:
+    """Like sqlQuery, but return the Arrow table from the cursor without converting to pandas."""
+    return _run(query, use_cache, on_cursor, 'arrow')
+
+
+
+_stream_slots = threading.BoundedSemaphore(STREAM_CONNECTIONS)
+
+
+@contextmanager
+def _stream_connection():
+    """A connection of its own for one streamed read, so a slow download never holds a pooled one."""
+    if not _stream_slots.acquire(timeout=STREAM_TIMEOUT):
+        raise TimeoutError(f"{STREAM_CONNECTIONS} downloads are already running; try again shortly.")
+    try:
+        connection = connect()
+        try:
+            yield connection
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+    finally:
+        _stream_slots.release()
+
+
+def streamQuery(query: str, batch_rows: int = 50000):
+    """Yield the result of a read as Arrow tables of at most ``batch_rows`` rows.
+
+    Rows are fetched from the cursor as they are consumed, so memory stays bounded by one
+    batch however large the result. Snapshotted tables are streamed from the local copy;
+    nothing is cached. Warehouse reads run on a dedicated connection, held until the
+    generator is exhausted or closed; at most SQL_STREAM_CONNECTIONS run at once, and
+    further ones raise TimeoutError after SQL_STREAM_TIMEOUT seconds.
+    """
+    if snapshot.serves(query):
+        yield from snapshot.get_snapshot().stream(query, batch_rows)
+        return
+    started = time.perf_counter()
+    rows = size = 0
+    try:
+        with _stream_connection() as connection:
+            connected = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute(query)
+                executed = time.perf_counter()
+                while True:
+                    batch = cursor.fetchmany_arrow(batch_rows)
+                    if batch.num_rows == 0:
+                        if rows == 0:
+                            yield batch  # Still carries the schema, e.g. for a CSV header
+                        break
+                    rows += batch.num_rows
+                    size += batch.nbytes
+                    yield batch
+    except Exception:
+        metrics.query_errors.inc(metrics.query_label(query))
+        raise
+    metrics.observe_query(query, connected - started, executed - connected, time.perf_counter() - executed, rows, size)
+
+
+metrics.register_gauges('accessmodel_sql_pool', lambda: get_pool().stats())
+metrics.register_gauges('accessmodel_query_cache', query_cache.stats)
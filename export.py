@@ -0,0 +1,63 @@
+import io
+import os
+
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '50000'))  # Rows fetched and written per chunk
+
+FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last ``drain``.
+
+    ``tell`` keeps counting across drains, because the Parquet writer records file offsets.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream(batches, fmt: str):
+    """Encode an iterator of Arrow tables as CSV or Parquet, yielding bytes as each batch is written.
+
+    CSV gets a single header row; Parquet gets one row group per batch and the footer at the end.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    sink = _ChunkSink()
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = pa_csv.CSVWriter(sink, batch.schema) if fmt == 'csv' else pq.ParquetWriter(sink, batch.schema)
+            writer.write_table(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
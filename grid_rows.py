@@ -0,0 +1,121 @@
+import re
+
+from db import sql_literal
+
+COLUMN_PATTERN = re.compile(r'^\w+$')
+LIKE_ESCAPE = '!'
+
+TEXT_OPERATORS = {
+    'contains': "LOWER(CAST({col} AS STRING)) LIKE {value} ESCAPE '!'",
+    'notContains': "LOWER(CAST({col} AS STRING)) NOT LIKE {value} ESCAPE '!'",
+    'startsWith': "LOWER(CAST({col} AS STRING)) LIKE {value} ESCAPE '!'",
+    'endsWith': "LOWER(CAST({col} AS STRING)) LIKE {value} ESCAPE '!'",
+    'equals': "LOWER(CAST({col} AS STRING)) = {value}",
+    'notEqual': "LOWER(CAST({col} AS STRING)) <> {value}",
+}
+NUMBER_OPERATORS = {
+    'equals': '=',
+    'notEqual': '<>',
+    'lessThan': '<',
+    'lessThanOrEqual': '<=',
+    'greaterThan': '>',
+    'greaterThanOrEqual': '>=',
+}
+
+
+def _like_pattern(text: str, operator: str) -> str:
+    text = text.lower().replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace('%', LIKE_ESCAPE + '%').replace('_', LIKE_ESCAPE + '_')
+    if operator == 'startsWith':
+        return text + '%'
+    if operator == 'endsWith':
+        return '%' + text
+    return '%' + text + '%'
+
+
+def _condition(col: str, model: dict):
+    """Translate a single AG Grid filter model into a SQL predicate."""
+    if 'conditions' in model or 'condition1' in model:
+        conditions = model.get('conditions') or [model.get('condition1'), model.get('condition2')]
+        parts = [_condition(col, {'filterType': model.get('filterType'), **condition}) for condition in conditions if condition]
+        parts = [part for part in parts if part]
+        joiner = ' OR ' if model.get('operator', 'AND').upper() == 'OR' else ' AND '
+        return '(' + joiner.join(parts) + ')' if parts else None
+
+    operator = model.get('type')
+    if operator == 'blank':
+        return f"({col} IS NULL OR CAST({col} AS STRING) = '')"
+    if operator == 'notBlank':
+        return f"({col} IS NOT NULL AND CAST({col} AS STRING) <> '')"
+
+    value = model.get('filter')
+    if value is None:
+        return None
+    if model.get('filterType') == 'number':
+        if operator == 'inRange':
+            return f"{col} BETWEEN {float(value)} AND {float(model.get('filterTo', value))}"
+        if operator not in NUMBER_OPERATORS:
+            raise ValueError(f"Unsupported number filter: {operator}")
+        return f"{col} {NUMBER_OPERATORS[operator]} {float(value)}"
+
+    if operator not in TEXT_OPERATORS:
+        raise ValueError(f"Unsupported text filter: {operator}")
+    if operator in ('equals', 'notEqual'):
+        literal = sql_literal(str(value).lower())
+    else:
+        literal = sql_literal(_like_pattern(str(value), operator))
+    return TEXT_OPERATORS[operator].format(col=col, value=literal)
+
+
+def where_clause(filter_model: dict, columns) -> str:
+    """Build a WHERE clause from an AG Grid filter model, ignoring unknown columns."""
+    predicates = []
+    for col, model in (filter_model or {}).items():
+        if col not in columns or not COLUMN_PATTERN.match(col):
+            continue
+        predicate = _condition(col, model)
+        if predicate:
+            predicates.append(predicate)
+    return ' WHERE ' + ' AND '.join(predicates) if predicates else ''
+
+
+def order_clause(sort_model: list, columns) -> str:
+    """Build an ORDER BY clause from an AG Grid sort model.
+
+    The remaining columns are appended as tie-breakers so LIMIT/OFFSET pages are stable.
+    """
+    terms, used = [], set()
+    for sort in sort_model or []:
+        col = sort.get('colId')
+        if col in columns and col not in used and COLUMN_PATTERN.match(col):
+            terms.append(f"{col} {'DESC' if sort.get('sort') == 'desc' else 'ASC'}")
+            used.add(col)
+    terms += [col for col in columns if col not in used and COLUMN_PATTERN.match(col)]
+    return ' ORDER BY ' + ', '.join(terms) if terms else ''
+
+
+def columns_query(base_query: str) -> str:
+    """Query returning no rows, used to discover a table's columns and types."""
+    return f"SELECT * FROM ({base_query}) AS t LIMIT 0"
+
+
+def page_query(base_query: str, columns, rows_request: dict) -> str:
+    """Query for one block of rows requested by an infinite-model grid."""
+    start = max(int(rows_request.get('startRow') or 0), 0)
+    end = max(int(rows_request.get('endRow') or start + 100), start)
+    return (
+        f"SELECT * FROM ({base_query}) AS t"
+        f"{where_clause(rows_request.get('filterModel'), columns)}"
+        f"{order_clause(rows_request.get('sortModel'), columns)}"
+        f" LIMIT {end - start} OFFSET {start}"
+    )
+
+
+def count_query(base_query: str, columns, rows_request: dict) -> str:
+    """Query for the number of rows matching the grid's current filters."""
+    return f"SELECT COUNT(*) AS row_count FROM ({base_query}) AS t{where_clause(rows_request.get('filterModel'), columns)}"
+
+
+def version_query(base_query: str, columns) -> str:
+    """Query for a cheap fingerprint of a table's contents: its row count and a sum of row hashes."""
+    columns = [col for col in columns if COLUMN_PATTERN.match(col)]
+    return f"SELECT COUNT(*) AS row_count, COALESCE(SUM(hash({', '.join(columns)})), 0) AS checksum FROM ({base_query}) AS t"
@@ -0,0 +1,39 @@
+"""Gunicorn settings for serving app:server in production, overridable from app.yaml."""
+import multiprocessing
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.getenv('DATABRICKS_APP_PORT', '8000')}"
+
+# Callbacks mostly wait on the warehouse, so each worker runs several request threads
+# sharing its connection pool, query cache and snapshot reader
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(multiprocessing.cpu_count() * 2, 8))))
+threads = int(os.getenv('GUNICORN_THREADS', os.getenv('SQL_POOL_SIZE', '8')))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))  # Slow tables run as background jobs, not in the request
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+# Recycle workers now and then so memory held by large results does not accumulate
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = max_requests // 10
+
+# Every worker imports the app itself, so pools, caches and background threads are never shared across a fork
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Start from empty shared metrics, so counts from an earlier run of the app are not added in."""
+    if os.getenv('METRICS_DIR'):
+        shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+
+
+def child_exit(server, worker):
+    """Fold a recycled or crashed worker's metrics into the exited totals (see metrics.fold_exited)."""
+    if os.getenv('METRICS_DIR'):
+        import metrics
+        metrics.fold_exited(worker.pid)
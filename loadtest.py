@@ -0,0 +1,281 @@
+"""Load-test the Dash callbacks with concurrent virtual admins.
+
+Usage: python loadtest.py --users 1 5 10 25 50 --duration 60 --think 1.0 [--url http://localhost:8000] [--json results.json]
+
+Each virtual user replays a realistic session over HTTP against _dash-update-component:
+it opens the tables page and flips through the tabs (loading grid blocks where the grid
+pages rows, or the whole table where the browser holds it), then opens the Add User
+page, adds a manager->worker permission and deletes it again, pausing for a random
+think time between actions. Every user sends its own X-Forwarded-Email. Each
+concurrency level starts sessions for --duration seconds, lets them finish, and reports
+throughput, latency percentiles and the error rate, overall and per action; the level
+where throughput stops growing while latency climbs is the saturation point.
+
+Without --url the app is served in-process (threaded werkzeug) against the local DuckDB
+stand-in seeded with --seed-rows users, so the warehouse is never touched. To measure a
+production-like instance, start it under gunicorn with SQL_BACKEND=duckdb and pass --url;
+the request bodies are still built from this checkout's callback definitions.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+import requests
+
+from dash_requests import callback_body
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(int(round(pct / 100 * len(values))) - 1, 0))]
+
+
+def patched_value(output, current):
+    """Apply a store update from a callback response: a full value or a Dash Patch of key assignments."""
+    if not isinstance(output, dict) or '__dash_patch_update' not in output:
+        return output
+    current = dict(current or {})
+    for operation in output['operations']:
+        if operation['operation'] == 'Assign' and len(operation['location']) == 1:
+            current[operation['location'][0]] = operation['params']['value']
+    return current
+
+
+class VirtualUser:
+    """One admin clicking through the app with its own HTTP session and browser-side state."""
+
+    def __init__(self, run, number):
+        self.run = run
+        self.email = f"user{number % run.emails}@example.com"
+        self.http = requests.Session()
+        self.http.headers['X-Forwarded-Email'] = self.email
+        self.random = random.Random(number)
+        self.stores = {}  # Browser-side dcc.Store contents, e.g. tab-versions and grid-versions
+
+    def think(self):
+        time.sleep(self.random.uniform(0, 2 * self.run.think))
+
+    def request(self, action, method, path, body=None):
+        """Send one request (polling background callbacks to completion) and record it."""
+        started = time.perf_counter()
+        error = None
+        payload = None
+        try:
+            response = self.http.request(method, self.run.url + path, json=body, timeout=self.run.timeout)
+            if body is not None and response.status_code == 200:
+                payload = response.json()
+                poll = {key: payload[key] for key in ('cacheKey', 'job') if key in payload}
+                # Background callbacks answer with a job to poll until its result is ready
+                while poll and 'response' not in payload:
+                    time.sleep(self.run.poll_interval)
+                    response = self.http.post(self.run.url + path, params=poll, json=body, timeout=self.run.timeout)
+                    if response.status_code != 200:
+                        break
+                    payload = response.json()
+            if response.status_code not in (200, 204):
+                error = f"HTTP {response.status_code}"
+            elif b'An error occurred' in response.content:
+                error = 'callback error'  # Callbacks report failures in an alert rather than a status code
+        except requests.RequestException as e:
+            error = type(e).__name__
+        self.run.record(action, time.perf_counter() - started, error)
+        return (payload or {}).get('response', {}) if error is None else {}
+
+    def callback(self, action, callback_name, values, changed, component_id=None):
+        body = self.run.callback_body(callback_name, values, changed, component_id)
+        return self.request(action, 'POST', '/_dash-update-component', body)
+
+    def open_tables_page(self):
+        self.request('GET /', 'GET', '/')
+        self.request('GET /_dash-layout', 'GET', '/_dash-layout')
+        self.request('GET /_dash-dependencies', 'GET', '/_dash-dependencies')
+        self.callback('render_page tables', 'render_page', {'tables-link.n_clicks': 1}, ['tables-link.n_clicks'])
+        self.callback('display_email', 'display_email', {'main-layout.children': []}, ['main-layout.children'])
+
+    def view_tab(self, tab):
+        response = self.callback(f'render_table {tab}', 'render_table', {
+            'tabs.value': tab, 'email-store.data': self.email, 'tab-versions.data': self.stores.get('tab-versions'),
+        }, ['tabs.value'])
+        if 'tab-load' in response:
+            # A clientSide grid whose rows this browser does not have yet: they arrive from a background job
+            loaded = self.callback(f'load_tab_data {tab}', 'load_tab_data', {
+                'tab-load.data': response['tab-load']['data'], 'email-store.data': self.email,
+            }, ['tab-load.data'])
+            if 'tab-versions' in loaded:
+                self.stores['tab-versions'] = patched_value(loaded['tab-versions']['data'], self.stores.get('tab-versions'))
+        if "'infinite'" in repr(response.get('tab-content')):
+            self.callback(f'load_grid_rows {tab}', 'load_grid_rows', {
+                'data-grid.getRowsRequest': {'startRow': 0, 'endRow': 100, 'sortModel': [], 'filterModel': {}},
+                'tabs.value': tab, 'email-store.data': self.email,
+            }, ['data-grid.getRowsRequest'])
+
+    def manage_permissions(self):
+        self.callback('render_page add user', 'render_page', {'add-user-link.n_clicks': 1}, ['add-user-link.n_clicks'])
+        response = self.callback('manage_grids page load', 'manage_grids', {'main-layout.children': []}, ['main-layout.children'])
+        if 'grid-versions' in response:
+            self.stores['grid-versions'] = response['grid-versions']['data']
+        self.think()
+        manager, worker = (f"user{self.random.randrange(self.run.emails)}@example.com" for _ in range(2))
+        response = self.callback('manage_grids add', 'manage_grids', {
+            'add-access-user-btn.n_clicks': 1,
+            'manager-user-dropdown.value': manager,
+            'worker-user-dropdown.value': worker,
+            'grid-versions.data': self.stores.get('grid-versions'),
+        }, ['add-access-user-btn.n_clicks'])
+        added = (response.get('user-grid', {}).get('rowTransaction') or {}).get('add')
+        if 'grid-versions' in response:
+            self.stores['grid-versions'] = response['grid-versions']['data']
+        if not added:
+            return
+        self.think()
+        response = self.callback('manage_grids delete', 'manage_grids', {
+            'delete-permission-btn.n_clicks': 1,
+            'user-grid.selectedRows': added[:1],
+            'grid-versions.data': self.stores.get('grid-versions'),
+        }, ['delete-permission-btn.n_clicks'])
+        if 'grid-versions' in response:
+            self.stores['grid-versions'] = response['grid-versions']['data']
+
+    def session(self):
+        """One visit: browse the tables, then add and remove a permission."""
+        self.open_tables_page()
+        for tab in ['tab1'] + self.random.sample(['tab2', 'tab3', 'tab4', 'tab1'], 3):
+            self.think()
+            self.view_tab(tab)
+        self.think()
+        self.manage_permissions()
+        self.think()
+
+    def loop(self, deadline):
+        time.sleep(self.random.uniform(0, self.run.think))  # Stagger the first requests
+        while time.monotonic() < deadline:
+            self.session()
+
+
+class LoadRun:
+    """Shared settings and the latency samples of one concurrency level."""
+
+    def __init__(self, url, app, emails, think, timeout, poll_interval):
+        self.url = url.rstrip('/')
+        self.app = app
+        self.emails = emails
+        self.think = think
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._samples = []  # (action, seconds, error)
+        self._lock = threading.Lock()
+
+    def callback_body(self, callback_name, values, changed, component_id=None):
+        return callback_body(self.app, callback_name, values, changed, component_id)
+
+    def record(self, action, seconds, error):
+        with self._lock:
+            self._samples.append((action, seconds, error))
+
+    def execute(self, users, duration):
+        """Run ``users`` virtual users for ``duration`` seconds and summarize the samples."""
+        self._samples = []
+        deadline = time.monotonic() + duration
+        threads = [threading.Thread(target=VirtualUser(self, number).loop, args=(deadline,), daemon=True)
+                   for number in range(users)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(users, self._samples, time.monotonic() - started)
+
+
+def summarize(users, samples, elapsed):
+    def figures(rows):
+        latencies = sorted(seconds for _, seconds, _ in rows)
+        errors = sum(1 for _, _, error in rows if error)
+        return {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4) if rows else 0.0,
+            'rps': round(len(rows) / elapsed, 1) if elapsed else 0.0,
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+            **{f'p{pct}_ms': round(percentile(latencies, pct) * 1000, 1) if latencies else None for pct in (50, 90, 95, 99)},
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+        }
+
+    actions = sorted({action for action, _, _ in samples})
+    error_kinds = {}
+    for _, _, error in samples:
+        if error:
+            error_kinds[error] = error_kinds.get(error, 0) + 1
+    return {
+        'users': users,
+        'seconds': round(elapsed, 1),
+        **figures(samples),
+        'error_kinds': error_kinds,
+        'actions': {action: figures([sample for sample in samples if sample[0] == action]) for action in actions},
+    }
+
+
+def print_summary(result):
+    print(f"\n{result['users']} users, {result['seconds']}s: {result['requests']} requests, {result['rps']} req/s, "
+          f"{result['error_rate'] * 100:.1f}% errors {result['error_kinds'] or ''}")
+    print(f"{'action':<36}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    rows = list(result['actions'].items()) + [('all', result)]
+    for action, figures in rows:
+        print(f"{action:<36}{figures['requests']:>10}{figures['errors']:>8}{figures['p50_ms']!s:>10}{figures['p90_ms']!s:>10}"
+              f"{figures['p95_ms']!s:>10}{figures['p99_ms']!s:>10}{figures['max_ms']!s:>10}")
+
+
+def serve_locally(app):
+    """Serve the app on a free local port from a background thread; returns its base URL."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass  # One access log line per request would swamp the report
+
+    server = make_server('127.0.0.1', 0, app.server, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 5, 10, 25], help='Concurrent virtual users, one level each')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run each level')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean think time between actions, in seconds')
+    parser.add_argument('--url', help='Base URL of a running instance (default: serve the app in-process)')
+    parser.add_argument('--seed-rows', type=int, default=10000, help='Synthetic users seeded into the local backend')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds before a request counts as failed')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    os.environ.setdefault('SQL_BACKEND', 'duckdb')
+    os.environ.setdefault('STARTUP_REPORT', 'false')
+    if args.url:
+        # The target seeds its own data; this process only needs the callback definitions
+        os.environ.setdefault('LOCAL_SEED_ROWS', '0')
+        os.environ.setdefault('SNAPSHOT_ENABLED', 'false')
+    else:
+        os.environ.setdefault('LOCAL_SEED_ROWS', str(args.seed_rows))
+        os.environ.setdefault('SNAPSHOT_DIR', tempfile.mkdtemp(prefix='accessmodel-loadtest-'))  # Not another run's data
+    import app as access_app
+    import background_jobs
+
+    url = args.url or serve_locally(access_app.app)
+    run = LoadRun(url, access_app.app, emails=max(args.seed_rows, 1), think=args.think, timeout=args.timeout,
+                  poll_interval=background_jobs.BACKGROUND_POLL_INTERVAL / 1000)
+    print(f"Load testing {url}")
+    results = []
+    for users in args.users:
+        result = run.execute(users, args.duration)
+        results.append(result)
+        print_summary(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
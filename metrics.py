@@ -0,0 +1,323 @@
+import atexit
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, request
+
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_SECONDS', '0'))  # Log queries slower than this; 0 disables
+# Directory shared by the gunicorn workers, so whichever worker is scraped reports the totals; empty keeps metrics per process
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))  # Seconds between writes of a worker's metrics
+EXITED_FILE = 'exited.json'  # Counter and histogram totals of workers that have exited (see fold_exited)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+BYTE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760, 104857600)
+
+_VERB_PATTERN = re.compile(r'^\s*(\w+)')
+_TABLE_PATTERN = re.compile(r'\b\w+\.\w+\.(\w+)')
+
+
+def query_label(query: str) -> str:
+    """Low-cardinality name for a statement, e.g. 'select:dimreportuser+teamgrouping'."""
+    verb = _VERB_PATTERN.match(query)
+    tables = sorted({name.lower() for name in _TABLE_PATTERN.findall(query)})
+    return f"{verb.group(1).lower() if verb else 'unknown'}:{'+'.join(tables) or 'none'}"
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def values(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(into: dict, values: dict):
+        for labels, value in values.items():
+            into[labels] = into.get(labels, 0) + value
+
+    def render(self, values=None):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted((self.values() if values is None else values).items()):
+            yield f"{self.name}{_labels(self.label_names, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 2))
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def values(self) -> dict:
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    @staticmethod
+    def merge(into: dict, values: dict):
+        for labels, series in values.items():
+            if labels in into:
+                into[labels] = [a + b for a, b in zip(into[labels], series)]
+            else:
+                into[labels] = list(series)
+
+    def render(self, values=None):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted((self.values() if values is None else values).items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, ('le', bound))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.label_names, labels, ('le', '+Inf'))} {series[-1]}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {series[-2]}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]}"
+
+
+query_connect_seconds = Histogram('accessmodel_query_connect_seconds', 'Time spent borrowing a warehouse connection.', ['query'])
+query_execute_seconds = Histogram('accessmodel_query_execute_seconds', 'Time spent executing a statement.', ['query'])
+query_fetch_seconds = Histogram('accessmodel_query_fetch_seconds', 'Time spent fetching a result.', ['query'])
+query_rows = Histogram('accessmodel_query_rows', 'Rows returned per statement.', ['query'], ROW_BUCKETS)
+query_bytes = Histogram('accessmodel_query_result_bytes', 'Arrow bytes returned per statement.', ['query'], BYTE_BUCKETS)
+query_errors = Counter('accessmodel_query_errors_total', 'Statements that raised an error.', ['query'])
+callback_seconds = Histogram('accessmodel_callback_seconds', 'Dash callback latency, including serialization.', ['callback'])
+callback_bytes = Histogram('accessmodel_callback_response_bytes', 'Serialized Dash callback response size.', ['callback'], BYTE_BUCKETS)
+callback_errors = Counter('accessmodel_callback_errors_total', 'Dash callback responses with an error status.', ['callback'])
+
+METRICS = [query_connect_seconds, query_execute_seconds, query_fetch_seconds, query_rows, query_bytes, query_errors,
+           callback_seconds, callback_bytes, callback_errors]
+
+_gauges = []  # (prefix, function returning a dict of numbers)
+
+
+def register_gauges(prefix: str, collect):
+    """Expose every numeric value returned by ``collect()`` as ``<prefix>_<key>``."""
+    _gauges.append((prefix, collect))
+
+
+def observe_query(query: str, connect: float, execute: float, fetch: float, rows: int, size: int):
+    label = query_label(query)
+    query_connect_seconds.observe(connect, label)
+    query_execute_seconds.observe(execute, label)
+    query_fetch_seconds.observe(fetch, label)
+    query_rows.observe(rows, label)
+    query_bytes.observe(size, label)
+    elapsed = connect + execute + fetch
+    if SLOW_QUERY_SECONDS and elapsed >= SLOW_QUERY_SECONDS:
+        print(f"Slow query ({elapsed:.2f}s: connect {connect:.2f}s, execute {execute:.2f}s, fetch {fetch:.2f}s, "
+              f"{rows} rows): {' '.join(query.split())[:500]}")
+
+
+def _gauge_values() -> dict:
+    """Current value of every registered gauge, by metric name."""
+    result = {}
+    for prefix, collect in _gauges:
+        try:
+            values = collect()
+        except Exception as e:
+            print(f"An error occurred while collecting {prefix} metrics: {str(e)}")
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                result[f"{prefix}_{key}"] = value
+    return result
+
+
+def _state() -> dict:
+    return {
+        'metrics': {metric.name: [[list(labels), value] for labels, value in metric.values().items()] for metric in METRICS},
+        'gauges': _gauge_values(),
+    }
+
+
+def _write(name: str, state: dict):
+    path = os.path.join(METRICS_DIR, name)
+    with open(f"{path}.{os.getpid()}.tmp", 'w') as f:
+        json.dump(state, f)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def _read(name: str):
+    try:
+        with open(os.path.join(METRICS_DIR, name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # Not written yet, or removed since the listing
+
+
+@contextmanager
+def _locked(exclusive: bool):
+    """Keep render() from reading the directory while fold_exited moves a worker's counts."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(os.path.join(METRICS_DIR, '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def _merge(states) -> dict:
+    """Sum the counters and histograms of several states, by metric name."""
+    merged = {metric.name: {} for metric in METRICS}
+    for state in states:
+        for metric in METRICS:
+            metric.merge(merged[metric.name], {tuple(labels): value for labels, value in state['metrics'].get(metric.name, [])})
+    return merged
+
+
+def flush():
+    """Write this process's metrics to METRICS_DIR, where render() in any worker picks them up."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    _write(f"{os.getpid()}.json", _state())
+
+
+def fold_exited(pid: int):
+    """Add an exited worker's last written counts to the exited totals and remove its file.
+
+    Called by the gunicorn master when a worker exits (see gunicorn.conf.py), so recycled
+    workers do not leave a growing number of files to read on every scrape, and a new worker
+    that gets the same pid starts from its own counts.
+    """
+    with _locked(exclusive=True):
+        state = _read(f"{pid}.json")
+        if state is None:
+            return
+        merged = _merge([_read(EXITED_FILE) or {'metrics': {}}, state])
+        _write(EXITED_FILE, {'metrics': {name: [[list(labels), value] for labels, value in values.items()]
+                                         for name, values in merged.items()}})
+        os.remove(os.path.join(METRICS_DIR, f"{pid}.json"))
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _states() -> dict:
+    """Every running worker's last written metrics by pid, this process's current ones included."""
+    states = {}
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith('.json') and name[:-5].isdigit():
+            state = _read(name)
+            if state is not None:
+                states[int(name[:-5])] = state
+    states[os.getpid()] = _state()
+    return states
+
+
+def render() -> str:
+    """Render every metric in the Prometheus text exposition format.
+
+    With METRICS_DIR set, counters and histograms are summed over the running workers and
+    the totals of exited ones (so they do not drop when a worker is recycled), and gauges are
+    reported per live worker with a ``pid`` label. Otherwise only this process is reported.
+    """
+    if not METRICS_DIR:
+        lines = []
+        for metric in METRICS:
+            lines.extend(metric.render())
+        for name, value in _gauge_values().items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    with _locked(exclusive=False):
+        states = _states()
+        exited = _read(EXITED_FILE)
+    merged = _merge(list(states.values()) + ([exited] if exited else []))
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render(merged[metric.name]))
+    gauges = {}
+    for pid, state in sorted(states.items()):
+        if _alive(pid):
+            for name, value in state['gauges'].items():
+                gauges.setdefault(name, []).append((pid, value))
+    for name, values in sorted(gauges.items()):
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f'{name}{{pid="{pid}"}} {value}' for pid, value in values)
+    return '\n'.join(lines) + '\n'
+
+
+_flusher = None
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            print(f"An error occurred while writing metrics to {METRICS_DIR}: {str(e)}")
+
+
+def start():
+    """Write this process's metrics to METRICS_DIR periodically and at exit (once per process)."""
+    global _flusher
+    if not METRICS_DIR or _flusher is not None:
+        return
+    _flusher = threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True)
+    _flusher.start()
+    atexit.register(flush)
+
+
+def instrument_dash(app):
+    """Time every Dash callback request and record its serialized response size."""
+    server = app.server
+
+    @server.before_request
+    def _start_timer():
+        if request.path.endswith('/_dash-update-component'):
+            g.callback_started = time.perf_counter()
+
+    @server.after_request
+    def _record_callback(response):
+        started = g.pop('callback_started', None)
+        if started is None:
+            return response
+        output = (request.get_json(silent=True) or {}).get('output')
+        callback = app.callback_map.get(output, {}).get('callback') if isinstance(output, str) else None
+        # The output string comes from the client, so it is never used as a label itself
+        label = getattr(callback, '__name__', 'unknown')
+        callback_seconds.observe(time.perf_counter() - started, label)
+        if not response.direct_passthrough:
+            callback_bytes.observe(response.calculate_content_length() or 0, label)
+        if response.status_code >= 400:
+            callback_errors.inc(label)
+        return response
@@ -0,0 +1,94 @@
+"""Apply the SQL migrations in migrations/ to the warehouse, each exactly once.
+
+Usage: python migrate.py [--list]
+
+Files run in name order, one statement at a time (statements end with ';' at the end of a
+line). Each statement is recorded in SCHEMA_MIGRATIONS_TABLE as it succeeds (as <file>#<n>),
+and each file once all of its statements have, so rerunning only applies the new ones and a
+run that failed part-way resumes at the statement that failed. Run it before deploying a
+version that relies on a new migration: the app never changes the schema itself. The local DuckDB stand-in is seeded with the migrated
+schema (see backends.seed) and does not need this.
+"""
+import argparse
+import os
+
+from db import arrowQuery, sql_literal
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATIONS_TABLE = os.getenv('SCHEMA_MIGRATIONS_TABLE', 'minerva_dev.accessmodel.schemamigrations')
+
+
+def migrations() -> list:
+    return sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith('.sql'))
+
+
+def statements(path: str) -> list:
+    """Split a migration file into statements, dropping '--' comment lines."""
+    with open(path) as f:
+        lines = [line for line in f.read().splitlines() if not line.strip().startswith('--')]
+    result, current = [], []
+    for line in lines:
+        current.append(line)
+        if line.rstrip().endswith(';'):
+            result.append('\n'.join(current).strip().rstrip(';'))
+            current = []
+    if '\n'.join(current).strip():
+        result.append('\n'.join(current).strip())
+    return result
+
+
+def applied() -> set:
+    arrowQuery(f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (name STRING, applied_at TIMESTAMP)")
+    return set(arrowQuery(f"SELECT name FROM {MIGRATIONS_TABLE}", use_cache=False)['name'].to_pylist())
+
+
+def _record(name: str):
+    arrowQuery(f"INSERT INTO {MIGRATIONS_TABLE} (name, applied_at) VALUES ({sql_literal(name)}, CURRENT_TIMESTAMP)")
+
+
+def migrate():
+    done = applied()
+    for name in migrations():
+        if name in done:
+            continue
+        print(f"Applying {name}")
+        for number, statement in enumerate(statements(os.path.join(MIGRATIONS_DIR, name)), start=1):
+            if f"{name}#{number}" in done:
+                continue  # Applied by an earlier run that failed further on
+            arrowQuery(statement)
+            _record(f"{name}#{number}")
+        _record(name)
+
+
+_identity_ids = set()  # Tables whose id column was found to be generated by the warehouse
+
+
+def require_identity_ids(table: str):
+    """Raise unless the table's id column is generated by the warehouse (migrations/001).
+
+    Called before writing rows without an id, so a version deployed ahead of its migration
+    refuses the write instead of storing rows whose id is NULL. Checked once per table.
+    """
+    if table in _identity_ids:
+        return
+    catalog, schema, name = table.split('.')
+    column = arrowQuery(
+        f"SELECT is_identity, column_default FROM system.information_schema.columns "
+        f"WHERE table_catalog = {sql_literal(catalog)} AND table_schema = {sql_literal(schema)} "
+        f"AND table_name = {sql_literal(name)} AND column_name = 'id'", use_cache=False).to_pylist()
+    # The local DuckDB stand-in has no identity columns; its ids come from a sequence default
+    if not column or not (column[0]['is_identity'] == 'YES' or (column[0]['column_default'] or '').startswith('nextval(')):
+        raise RuntimeError(f"{table}.id is not an identity column yet. Run python migrate.py before deploying this version.")
+    _identity_ids.add(table)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--list', action='store_true', help='Only show which migrations are pending')
+    args = parser.parse_args()
+    if args.list:
+        done = applied()
+        for name in migrations():
+            print(f"{'applied' if name in done else 'pending'}  {name}")
+    else:
+        migrate()
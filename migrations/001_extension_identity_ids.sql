@@ -0,0 +1,50 @@
+-- Let the warehouse generate extension row ids instead of the app computing MAX(id) + 1.
+-- Delta cannot add an identity to an existing column, so each table is copied into one that
+-- has it. Existing ids are kept, SYNC IDENTITY continues the sequence after the highest one,
+-- and the old table stays behind as *_preidentity until it is dropped by hand.
+--
+-- Before running: stop every writer of the two tables (the app, and any job that inserts
+-- permissions). Rows written between the copy and the rename land in *_preidentity; the
+-- catch-up insert after the rename copies them over, but only a write freeze guarantees none
+-- are lost. Deploy the version that relies on identity ids only afterwards; it refuses to
+-- write until the id column is an identity column.
+--
+-- Not carried over, because the new tables are new objects: grants and table properties.
+-- Compare SHOW GRANTS ON TABLE / SHOW TBLPROPERTIES on each *_preidentity table with the new
+-- table and re-apply what is missing before restarting writers.
+--
+-- migrate.py records each statement once it succeeds, so a failed run resumes at the
+-- statement that failed. The statements are also safe to repeat on their own where they can
+-- be (IF NOT EXISTS, inserts that skip ids already copied).
+
+CREATE TABLE IF NOT EXISTS minerva_dev.accessmodel.managerworkerextension_identity (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    manager_name STRING,
+    worker_name STRING,
+    timestamp TIMESTAMP
+);
+INSERT INTO minerva_dev.accessmodel.managerworkerextension_identity (id, manager_name, worker_name, timestamp)
+SELECT id, manager_name, worker_name, timestamp FROM minerva_dev.accessmodel.managerworkerextension
+WHERE id NOT IN (SELECT id FROM minerva_dev.accessmodel.managerworkerextension_identity);
+ALTER TABLE minerva_dev.accessmodel.managerworkerextension RENAME TO minerva_dev.accessmodel.managerworkerextension_preidentity;
+ALTER TABLE minerva_dev.accessmodel.managerworkerextension_identity RENAME TO minerva_dev.accessmodel.managerworkerextension;
+INSERT INTO minerva_dev.accessmodel.managerworkerextension (id, manager_name, worker_name, timestamp)
+SELECT id, manager_name, worker_name, timestamp FROM minerva_dev.accessmodel.managerworkerextension_preidentity
+WHERE id NOT IN (SELECT id FROM minerva_dev.accessmodel.managerworkerextension);
+ALTER TABLE minerva_dev.accessmodel.managerworkerextension ALTER COLUMN id SYNC IDENTITY;
+
+CREATE TABLE IF NOT EXISTS minerva_dev.accessmodel.userteamextension_identity (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    worker_name STRING,
+    team_name STRING,
+    timestamp TIMESTAMP
+);
+INSERT INTO minerva_dev.accessmodel.userteamextension_identity (id, worker_name, team_name, timestamp)
+SELECT id, worker_name, team_name, timestamp FROM minerva_dev.accessmodel.userteamextension
+WHERE id NOT IN (SELECT id FROM minerva_dev.accessmodel.userteamextension_identity);
+ALTER TABLE minerva_dev.accessmodel.userteamextension RENAME TO minerva_dev.accessmodel.userteamextension_preidentity;
+ALTER TABLE minerva_dev.accessmodel.userteamextension_identity RENAME TO minerva_dev.accessmodel.userteamextension;
+INSERT INTO minerva_dev.accessmodel.userteamextension (id, worker_name, team_name, timestamp)
+SELECT id, worker_name, team_name, timestamp FROM minerva_dev.accessmodel.userteamextension_preidentity
+WHERE id NOT IN (SELECT id FROM minerva_dev.accessmodel.userteamextension);
+ALTER TABLE minerva_dev.accessmodel.userteamextension ALTER COLUMN id SYNC IDENTITY;
@@ -0,0 +1,8 @@
+-- Deletes on the extension tables leave a tombstone here, so other sessions can drop the row
+-- from their grids (see change_feed.py). The app prunes rows older than CHANGE_FEED_RETENTION.
+
+CREATE TABLE IF NOT EXISTS minerva_dev.accessmodel.extensiontombstone (
+    table_name STRING,
+    row_id BIGINT,
+    deleted_at TIMESTAMP
+);
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from db import arrowQuery, is_read_query, sqlQuery
+from query_cache import normalize_sql
+
+# Batch settings, overridable from app.yaml
+BATCH_WORKERS = int(os.getenv('SQL_BATCH_WORKERS', '8'))
+BATCH_TIMEOUT = float(os.getenv('SQL_BATCH_TIMEOUT', '60'))  # Default per-query timeout in seconds
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='sql-batch')
+_in_flight = {}  # (normalized SQL, use_cache, arrow) -> InFlightQuery, shared by concurrent callbacks
+_lock = threading.Lock()
+
+
+class InFlightQuery:
+    """A submitted statement and the callers currently waiting on it."""
+
+    def __init__(self, key):
+        self.key = key
+        self.future = None
+        self.cursor = None
+        self.waiters = 0
+
+    def attach_cursor(self, cursor):
+        self.cursor = cursor
+
+    def cancel(self):
+        """Cancel the statement, whether it is still queued or already running."""
+        if self.future.done() or self.future.cancel():
+            return
+        cursor = self.cursor
+        if cursor is not None:
+            try:
+                cursor.cancel()
+            except Exception as e:
+                print(f"An error occurred while cancelling a query: {str(e)}")
+
+
+def _forget(entry):
+    with _lock:
+        if _in_flight.get(entry.key) is entry:
+            del _in_flight[entry.key]
+
+
+def submit(query: str, use_cache: bool = True, arrow: bool = False) -> InFlightQuery:
+    """Start a statement on the batch pool, joining an identical read that is already running."""
+    key = (normalize_sql(query), use_cache, arrow) if is_read_query(query) else None
+    with _lock:
+        entry = _in_flight.get(key) if key is not None else None
+        started = entry is None
+        if started:
+            entry = InFlightQuery(key)
+            entry.future = _executor.submit(arrowQuery if arrow else sqlQuery, query, use_cache, entry.attach_cursor)
+            if key is not None:
+                _in_flight[key] = entry
+        entry.waiters += 1
+    if started and key is not None:
+        # Outside the lock: a future that already finished runs _forget, which takes _lock, right here
+        entry.future.add_done_callback(lambda _: _forget(entry))
+    return entry
+
+
+def release(entry: InFlightQuery, cancel: bool = False):
+    """Stop waiting on a statement; the last waiter to give up cancels it."""
+    with _lock:
+        entry.waiters -= 1
+        abandoned = entry.waiters == 0
+        if cancel and abandoned and _in_flight.get(entry.key) is entry:
+            del _in_flight[entry.key]
+    if cancel and abandoned:
+        entry.cancel()
+
+
+def run_queries(queries: dict, timeout: float = BATCH_TIMEOUT, timeouts: dict = None, use_cache: bool = True,
+                arrow: bool = False) -> dict:
+    """Run independent statements concurrently and return their DataFrames (or Arrow tables) by name.
+
+    ``timeouts`` overrides the timeout for individual queries. If any query fails or
+    times out, the rest of the batch is cancelled and the error is raised.
+    """
+    timeouts = timeouts or {}
+    started = time.monotonic()
+    entries = {name: submit(query, use_cache, arrow) for name, query in queries.items()}
+    results = {}
+    try:
+        for name, entry in entries.items():
+            remaining = started + timeouts.get(name, timeout) - time.monotonic()
+            try:
+                results[name] = entry.future.result(timeout=max(remaining, 0))
+            except FutureTimeoutError:
+                raise TimeoutError(f"Query '{name}' did not finish within {timeouts.get(name, timeout)} seconds.")
+    finally:
+        for name, entry in entries.items():
+            release(entry, cancel=name not in results)
+    return results
+
+
+def cancel_all():
+    """Cancel every read this process is running, e.g. when its background job is superseded."""
+    with _lock:
+        entries = list(_in_flight.values())
+        _in_flight.clear()
+    for entry in entries:
+        entry.cancel()
+
+
+def cancel_and_exit(signum, frame):
+    """SIGTERM handler for background jobs: cancel the warehouse statements instead of leaving them running."""
+    cancel_all()
+    os._exit(128 + signum)
@@ -0,0 +1,159 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import pyarrow as pa
+
+# Default lifetime of a cached result, overridable from app.yaml
+DEFAULT_TTL = float(os.getenv('QUERY_CACHE_TTL', '300'))
+MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Per-table lifetimes. Gold tables change slowly; the extension tables are written by this app
+# (and invalidated on write) but can also be edited by other instances, so keep them short.
+TABLE_TTLS = {
+    'dimreportuser': 3600,
+    'teamgrouping': 3600,
+    'bridgeuserteam': 3600,
+    'bridgemandateteamaccess': 3600,
+    'managerworkerextension': 60,
+    'userteamextension': 60,
+}
+
+# Three-part catalog.schema.table names; the table part is what we key dependencies on
+TABLE_PATTERN = re.compile(r'`?\b\w+`?\.`?\w+`?\.`?(\w+)`?')
+WRITE_TARGET_PATTERN = re.compile(
+    r'^\s*(?:INSERT\s+(?:INTO|OVERWRITE)(?:\s+TABLE)?|DELETE\s+FROM|UPDATE|MERGE\s+INTO|TRUNCATE\s+TABLE)\s+([\w.`]+)',
+    re.IGNORECASE
+)
+STRING_LITERAL_PATTERN = re.compile(r"('(?:[^'\\]|\\.)*')")
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace outside string literals so formatting differences share a cache entry."""
+    parts = STRING_LITERAL_PATTERN.split(query.strip().rstrip(';'))
+    return ''.join(part if i % 2 else ' '.join(part.split()) for i, part in enumerate(parts)).strip()
+
+
+def query_tables(query: str) -> frozenset:
+    """Return the (lower-cased) names of the tables a statement references."""
+    return frozenset(name.lower() for name in TABLE_PATTERN.findall(query))
+
+
+def write_target(query: str):
+    """Return the table a write statement modifies, or None if it cannot be determined."""
+    match = WRITE_TARGET_PATTERN.match(query)
+    if not match:
+        return None
+    return match.group(1).replace('`', '').split('.')[-1].lower()
+
+
+class CacheEntry:
+    def __init__(self, result, tables, expires_at, size):
+        self.result = result
+        self.tables = tables
+        self.expires_at = expires_at
+        self.size = size
+
+
+def result_size(result) -> int:
+    """Approximate memory held by a cached DataFrame or Arrow table."""
+    if isinstance(result, pa.Table):
+        return int(result.nbytes)
+    return int(result.memory_usage(deep=True).sum())  # pandas, imported only once a caller asks for a DataFrame
+
+
+class QueryCache:
+    """Process-wide LRU cache of query results keyed by normalized SQL and result format.
+
+    Entries expire after the shortest TTL of the tables they read and are dropped
+    as soon as a write touches one of those tables. Cached DataFrames and Arrow
+    tables are shared between callers and must not be modified in place.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, default_ttl=DEFAULT_TTL, table_ttls=None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.table_ttls = TABLE_TTLS if table_ttls is None else table_ttls
+        self._entries = OrderedDict()
+        self._generations = {}  # Bumped on every write so in-flight reads of old data are not stored
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, query: str, fmt: str = 'pandas'):
+        key = (normalize_sql(query), fmt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.result
+
+    def generation(self, query: str) -> tuple:
+        """Snapshot the write generation of the tables a query reads; pass it back to ``put``."""
+        tables = query_tables(query)
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in sorted(tables))
+
+    def put(self, query: str, result, generation: tuple = None, fmt: str = 'pandas'):
+        key = (normalize_sql(query), fmt)
+        tables = query_tables(query)
+        ttl = min((self.table_ttls.get(table, self.default_ttl) for table in tables), default=self.default_ttl)
+        size = result_size(result)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != tuple(self._generations.get(t, 0) for t in sorted(tables)):
+                return  # A write landed while this result was being fetched
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CacheEntry(result, tables, time.monotonic() + ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_tables(self, tables) -> int:
+        """Drop every entry that reads any of ``tables``; returns the number of entries dropped."""
+        tables = {table.lower() for table in tables}
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key, entry in self._entries.items() if entry.tables & tables]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+query_cache = QueryCache()
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from query_batch import run_queries
+
+SEARCH_INDEX_REFRESH = float(os.getenv('SEARCH_INDEX_REFRESH', '3600'))  # Seconds between rebuilds
+SEARCH_LIMIT = int(os.getenv('SEARCH_LIMIT', '50'))  # Options returned per keystroke
+
+SEARCH_QUERIES = {
+    'emails': "SELECT DISTINCT internalemailaddress AS value, fullname AS alias FROM minerva_prod.goldaccessmodel.dimreportuser",
+    'teams': "SELECT DISTINCT TeamName AS value, CAST(NULL AS STRING) AS alias FROM minerva_prod.goldaccessmodel.teamgrouping",
+}
+
+
+class SearchIndex:
+    """Sorted prefix index over dropdown values, with a substring fallback.
+
+    Each value can be found by itself or by an alias (e.g. an email by the person's name).
+    """
+
+    def __init__(self, values, aliases=None):
+        aliases = aliases or [None] * len(values)
+        self.aliases = {}
+        entries = set()
+        for value, alias in zip(values, aliases):
+            if value is None:
+                continue
+            entries.add((value.lower(), value))
+            if alias:
+                entries.add((alias.lower(), value))
+                self.aliases[value] = alias
+        entries = sorted(entries)
+        self._keys = [key for key, _ in entries]
+        self._values = [value for _, value in entries]
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(set(self._values))
+
+    def search(self, text: str, limit: int = SEARCH_LIMIT) -> list:
+        """Return up to ``limit`` values whose key starts with ``text``, then ones containing it."""
+        text = (text or '').strip().lower()
+        if not text:
+            return []
+        found = {}
+        i = bisect_left(self._keys, text)
+        while i < len(self._keys) and self._keys[i].startswith(text) and len(found) < limit:
+            found.setdefault(self._values[i], None)
+            i += 1
+        if len(found) < limit:
+            for key, value in zip(self._keys, self._values):
+                if text in key and value not in found:
+                    found[value] = None
+                    if len(found) >= limit:
+                        break
+        return list(found)
+
+    def options(self, text: str, limit: int = SEARCH_LIMIT) -> list:
+        """Dropdown options for the matches; ``search`` lets the client-side filter match aliases too."""
+        return [
+            {'label': value, 'value': value, 'search': f"{value} {self.aliases.get(value, '')}"}
+            for value in self.search(text, limit)
+        ]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_refreshing = set()
+
+
+def _load(name) -> SearchIndex:
+    result = run_queries({name: SEARCH_QUERIES[name]}, arrow=True)[name]
+    return SearchIndex(result['value'].to_pylist(), result['alias'].to_pylist())
+
+
+def _refresh(name):
+    try:
+        _indexes[name] = _load(name)
+    except Exception as e:
+        print(f"An error occurred while refreshing the {name} search index: {str(e)}")
+    finally:
+        _refreshing.discard(name)
+
+
+def get_search_index(name: str) -> SearchIndex:
+    """Return the 'emails' or 'teams' index, building it on first use and refreshing it in the background."""
+    index = _indexes.get(name)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(name)
+            if index is None:
+                index = _indexes[name] = _load(name)
+    elif time.time() - index.loaded_at > SEARCH_INDEX_REFRESH and name not in _refreshing:
+        _refreshing.add(name)
+        threading.Thread(target=_refresh, args=(name,), name=f'{name}-search-refresh', daemon=True).start()
+    return index
+
+
+def reset():
+    """Drop every index so the next search rebuilds it, e.g. after switching backends."""
+    _indexes.clear()
@@ -0,0 +1,230 @@
+import fcntl
+import os
+import re
+import tempfile
+import threading
+import time
+
+import pyarrow as pa
+
+import db  # Module import: db routes reads here, and refresh() reads through db
+import metrics
+from query_cache import STRING_LITERAL_PATTERN, TABLE_PATTERN, query_tables
+
+# Snapshot settings, overridable from app.yaml
+SNAPSHOT_ENABLED = os.getenv('SNAPSHOT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'accessmodel-snapshot'))
+SNAPSHOT_REFRESH = float(os.getenv('SNAPSHOT_REFRESH', '3600'))  # Rebuild snapshots older than this many seconds
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv('SNAPSHOT_CHECK_INTERVAL', '60'))  # Seconds between staleness checks
+
+# Slowly changing gold tables served from the local snapshot instead of the warehouse
+SNAPSHOT_TABLES = [
+    table.strip() for table in os.getenv(
+        'SNAPSHOT_TABLES',
+        'minerva_prod.goldaccessmodel.dimreportuser,'
+        'minerva_prod.goldaccessmodel.teamgrouping,'
+        'minerva_prod.goldaccessmodel.bridgemandateteamaccess'
+    ).split(',') if table.strip()
+]
+_NAMES = {table.split('.')[-1].lower(): table for table in SNAPSHOT_TABLES}
+# The configured three-part names, optionally back-quoted, capturing the table part
+_TABLE_REFERENCE = re.compile('|'.join(
+    r'`?\b' + r'`?\.`?'.join(map(re.escape, table.split('.')[:-1])) + r'`?\.`?(' + re.escape(table.split('.')[-1]) + r')\b`?'
+    for table in SNAPSHOT_TABLES
+), re.IGNORECASE) if SNAPSHOT_TABLES else None
+
+
+def _path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.arrow")
+
+
+class SnapshotFile:
+    """A memory-mapped Arrow IPC snapshot of one table.
+
+    The table's buffers point straight into the page cache, so every worker process on
+    the host shares one copy of the data.
+    """
+
+    def __init__(self, path: str):
+        stat = os.stat(path)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        self.written_at = stat.st_mtime
+        with pa.memory_map(path) as source:
+            self.table = pa.ipc.open_file(source).read_all()
+
+
+class Snapshot:
+    """Serves reads that only touch snapshotted tables from the local files.
+
+    Refreshes write a new file and rename it over the old one, so a reader either sees
+    the previous snapshot or the new one. Readers notice the swap by the file's inode and
+    remap it; tables already handed out keep the old mapping until they are released.
+    """
+
+    def __init__(self):
+        self._files = {}  # short table name -> SnapshotFile
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        import duckdb  # Only once a snapshot is read, not at import
+        self._engine = duckdb.connect()
+        self.served = 0
+
+    def _reload(self):
+        """Pick up snapshots written by this or another process since the last check."""
+        if time.monotonic() - self._checked_at < 1:
+            return
+        with self._lock:
+            for name in _NAMES:
+                try:
+                    stat = os.stat(_path(name))
+                except FileNotFoundError:
+                    self._files.pop(name, None)
+                    continue
+                current = self._files.get(name)
+                if current is None or current.identity != (stat.st_ino, stat.st_mtime_ns):
+                    try:
+                        self._files[name] = SnapshotFile(_path(name))
+                    except (OSError, pa.ArrowInvalid) as e:
+                        print(f"An error occurred while loading the {name} snapshot: {str(e)}")
+            self._checked_at = time.monotonic()
+
+    def covers(self, query: str) -> bool:
+        """Return True if every table the read references has a loaded snapshot."""
+        tables = query_tables(query)
+        if not tables or len(TABLE_PATTERN.findall(query)) != len(_TABLE_REFERENCE.findall(query)):
+            return False
+        self._reload()
+        return all(name in self._files for name in tables)
+
+    def query(self, query: str) -> pa.Table:
+        """Run a read against the snapshots; the tables are scanned in place, without copying."""
+        files = {name: self._files[name] for name in query_tables(query)}
+        cursor = self._engine.cursor()
+        try:
+            for name, snapshot_file in files.items():
+                cursor.register(name, snapshot_file.table)
+            result = cursor.execute(_local_sql(query)).to_arrow_table()
+        finally:
+            cursor.close()
+        self.served += 1
+        return result
+
+    def stream(self, query: str, batch_rows: int):
+        """Like ``query``, but yield the result in Arrow tables of at most ``batch_rows`` rows."""
+        files = {name: self._files[name] for name in query_tables(query)}
+        cursor = self._engine.cursor()
+        try:
+            for name, snapshot_file in files.items():
+                cursor.register(name, snapshot_file.table)
+            reader = cursor.execute(_local_sql(query)).fetch_record_batch(batch_rows)
+            self.served += 1
+            empty = True
+            for batch in reader:
+                empty = False
+                yield pa.Table.from_batches([batch])
+            if empty:
+                yield reader.schema.empty_table()
+        finally:
+            cursor.close()
+
+    def written_at(self, query: str):
+        """Time the oldest snapshot behind a read was written, or None if it is not served locally."""
+        if not SNAPSHOT_ENABLED or not self.covers(query):
+            return None
+        return min(self._files[name].written_at for name in query_tables(query))
+
+    def stats(self) -> dict:
+        self._reload()
+        now = time.time()
+        stats = {'tables': len(self._files), 'queries_served': self.served}
+        for name, snapshot_file in self._files.items():
+            stats[f'{name}_age_seconds'] = round(now - snapshot_file.written_at, 1)
+            stats[f'{name}_rows'] = snapshot_file.table.num_rows
+        return stats
+
+
+def _standard_literal(match) -> str:
+    """Re-quote a backslash-escaped literal (Databricks style) the standard way DuckDB expects."""
+    body = re.sub(r"\\(.)", r"\1", match.group(0)[1:-1])
+    return "'" + body.replace("'", "''") + "'"
+
+
+def _local_sql(query: str) -> str:
+    """Point three-part table names at the registered snapshots and normalize string literals."""
+    if db.get_backend().name == 'databricks':
+        parts = STRING_LITERAL_PATTERN.split(query)
+        query = ''.join(STRING_LITERAL_PATTERN.sub(_standard_literal, part) if i % 2 else part
+                        for i, part in enumerate(parts))
+    parts = re.split(r"('(?:[^']|'')*')", query)
+    return ''.join(part if i % 2 else _TABLE_REFERENCE.sub(lambda m: next(g for g in m.groups() if g).lower(), part)
+                   for i, part in enumerate(parts))
+
+
+def refresh(force: bool = False) -> bool:
+    """Rewrite stale snapshots from the warehouse.
+
+    Only one process on the host refreshes at a time; the others skip and pick up the
+    new files on their next read. Returns False if another process held the lock.
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, '.refresh.lock'), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        for name, table in _NAMES.items():
+            path = _path(name)
+            try:
+                age = time.time() - os.stat(path).st_mtime
+            except FileNotFoundError:
+                age = None
+            if not force and age is not None and age < SNAPSHOT_REFRESH:
+                continue
+            try:
+                result = db.arrowQuery(f"SELECT * FROM {table}", use_cache=False)  # Bypasses the snapshot
+                temporary = f"{path}.{os.getpid()}.tmp"
+                with pa.OSFile(temporary, 'wb') as sink, pa.ipc.new_file(sink, result.schema) as writer:
+                    writer.write_table(result)
+                os.replace(temporary, path)  # Atomic swap
+            except Exception as e:
+                print(f"An error occurred while refreshing the {name} snapshot: {str(e)}")
+    return True
+
+
+def _refresh_loop():
+    while True:
+        refresh()
+        time.sleep(SNAPSHOT_CHECK_INTERVAL)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_started = False
+
+
+def get_snapshot() -> Snapshot:
+    """Return the process-wide snapshot reader."""
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = Snapshot()
+    return _snapshot
+
+
+def start():
+    """Take the first snapshot now and keep refreshing in the background (once per process)."""
+    global _started
+    with _snapshot_lock:
+        if _started or not SNAPSHOT_ENABLED:
+            return
+        _started = True
+    threading.Thread(target=_refresh_loop, name='snapshot-refresh', daemon=True).start()
+
+
+def serves(query: str) -> bool:
+    """Return True if a cached read can be answered from the local snapshot."""
+    return SNAPSHOT_ENABLED and _TABLE_REFERENCE is not None and get_snapshot().covers(query)
+
+
+metrics.register_gauges('accessmodel_snapshot', lambda: get_snapshot().stats())
@@ -0,0 +1,72 @@
+"""Cold-start timing: where the time goes between process start and the first response.
+
+Import this first so its clock starts before anything heavy is loaded.
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+STARTUP_REPORT = os.getenv('STARTUP_REPORT', 'true').lower() in ('1', 'true', 'yes')
+
+STARTED = time.perf_counter()
+_phases = []  # (name, seconds), in the order they finished
+_lock = threading.Lock()
+_first_response = None
+
+
+@contextmanager
+def phase(name: str):
+    """Time a startup step, e.g. ``with phase('import dash'):``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _phases.append((name, time.perf_counter() - started))
+
+
+def _heaviest_modules(limit=8):
+    """Top-level packages by number of loaded modules, a cheap proxy for import cost."""
+    counts = {}
+    for name in list(sys.modules):
+        root = name.split('.')[0]
+        counts[root] = counts.get(root, 0) + 1
+    return sorted(counts.items(), key=lambda item: -item[1])[:limit]
+
+
+def report() -> str:
+    with _lock:
+        phases = list(_phases)
+    lines = [f"Startup report (pid {os.getpid()}):"]
+    lines += [f"  {name:<36}{seconds * 1000:>9.1f} ms" for name, seconds in phases]
+    if _first_response is not None:
+        lines.append(f"  {'process start -> first response':<36}{_first_response * 1000:>9.1f} ms")
+    lines.append("  loaded packages (modules): " + ', '.join(f"{name} ({count})" for name, count in _heaviest_modules()))
+    lines.append("  For per-module import times run: python -X importtime app.py 2> importtime.log")
+    return '\n'.join(lines)
+
+
+def stats() -> dict:
+    with _lock:
+        values = {name.replace(' ', '_').replace('-', '_').lower() + '_seconds': round(seconds, 4) for name, seconds in _phases}
+    if _first_response is not None:
+        values['first_response_seconds'] = round(_first_response, 4)
+    return values
+
+
+def instrument(server):
+    """Record the time to the first response and print the report."""
+
+    @server.after_request
+    def _first_response_hook(response):
+        global _first_response
+        if _first_response is None:
+            with _lock:
+                first = _first_response is None
+                if first:
+                    _first_response = time.perf_counter() - STARTED
+            if first and STARTUP_REPORT:
+                print(report())
+        return response
@@ -0,0 +1,39 @@
+"""Queries behind the Access Model Tables tabs, and the whole-table load that runs as a background job.
+
+Kept out of app.py so the job runner (see background_jobs) can import the job without building the app.
+"""
+import dash
+from dash import html
+
+import columnar
+from db import sql_literal
+from query_batch import run_queries
+
+
+def tab_query(tab, email):
+    """Return the base query behind an Access Model Tables tab, or None for an unknown tab."""
+    if tab == 'tab1':
+        return "SELECT UserKey, EmployeeNumber, internalemailaddress as EmailAddress, fullname as Name FROM minerva_prod.goldaccessmodel.dimreportuser"
+    elif tab == 'tab2':
+        return "SELECT TeamGroupingKey, TeamName, Office, City FROM minerva_prod.goldaccessmodel.teamgrouping"
+    elif tab == 'tab3':
+        return "SELECT * FROM minerva_prod.goldaccessmodel.bridgemandateteamaccess"
+    elif tab == 'tab4':  # Handle the new "Own Permission" tab
+        return f"SELECT dimreportuser.UserKey, EmployeeNumber, internalemailaddress as Email, fullname as Name, TeamName FROM minerva_prod.goldaccessmodel.dimreportuser INNER JOIN minerva_prod.goldaccessmodel.bridgeuserteam on dimreportuser.UserKey = bridgeuserteam.UserKey INNER JOIN minerva_prod.goldaccessmodel.teamgrouping on teamgrouping.TeamGroupingKey = bridgeuserteam.TeamGroupingKey WHERE internalemailaddress={sql_literal(email)}"
+    return None
+
+
+def load_tab_data(load, email):
+    """Send every row of one clientSide tab to the browser."""
+    if not load:
+        return dash.no_update, dash.no_update, None
+    try:
+        tab = load['tab']
+        table_data = run_queries({'table': tab_query(tab, email)}, arrow=True)['table']  # Tracked, so a terminated job can cancel it
+        # Patches only send this tab's payload, not the ones the browser already holds
+        tab_data, tab_versions = dash.Patch(), dash.Patch()
+        tab_data[tab] = columnar.to_columns(table_data)
+        tab_versions[tab] = load['version']
+        return tab_data, tab_versions, None
+    except Exception as e:
+        return dash.no_update, dash.no_update, html.Div(f"An error occurred: {str(e)}")
@@ -0,0 +1,97 @@
+from access_index import AccessIndex
+
+
+def closure(index):
+    """The closure as plain dicts, without the empty sets left behind by lookups."""
+    return ({user: users for user, users in index._reach.items() if users},
+            {user: users for user, users in index._reached_by.items() if users})
+
+
+def rebuilt(index):
+    """A fresh index with the same edges, for comparing an incrementally maintained closure."""
+    fresh = AccessIndex()
+    for (manager, worker), count in index._edges.items():
+        for _ in range(count):
+            fresh.add_manager_worker(manager, worker)
+    return fresh
+
+
+def test_add_extends_closure_above_and_below():
+    index = AccessIndex()
+    index.add_manager_worker('b', 'c')
+    index.add_manager_worker('a', 'b')
+    index.add_manager_worker('c', 'd')
+    assert index._reach['a'] == {'b', 'c', 'd'}
+    assert index._reached_by['d'] == {'a', 'b', 'c'}
+
+
+def test_remove_keeps_paths_that_remain():
+    index = AccessIndex()
+    for manager, worker in [('a', 'b'), ('b', 'd'), ('a', 'c'), ('c', 'd')]:
+        index.add_manager_worker(manager, worker)
+    index.remove_manager_worker('b', 'd')
+    assert index._reach['a'] == {'b', 'c', 'd'}
+    assert index._reach['b'] == set()
+    assert index._reached_by['d'] == {'a', 'c'}
+    assert closure(index) == closure(rebuilt(index))
+
+
+def test_cycle_does_not_reach_itself():
+    index = AccessIndex()
+    for manager, worker in [('a', 'b'), ('b', 'c'), ('c', 'a')]:
+        index.add_manager_worker(manager, worker)
+    assert index._reach['a'] == {'b', 'c'}
+    assert index._reached_by['a'] == {'b', 'c'}
+    index.remove_manager_worker('c', 'a')
+    assert index._reach['a'] == {'b', 'c'}
+    assert index._reach['c'] == set()
+    assert index._reached_by['a'] == set()
+    assert closure(index) == closure(rebuilt(index))
+
+
+def test_self_edge_is_ignored():
+    index = AccessIndex()
+    index.add_manager_worker('a', 'a')
+    assert closure(index) == ({}, {})
+    index.remove_manager_worker('a', 'a')
+    assert not index._edges
+
+
+def test_duplicate_edge_needs_every_row_removed():
+    index = AccessIndex()
+    index.add_manager_worker('a', 'b')
+    index.add_manager_worker('a', 'b')
+    index.remove_manager_worker('a', 'b')
+    assert index._reach['a'] == {'b'}
+    index.remove_manager_worker('a', 'b')
+    assert index._reach['a'] == set()
+    index.remove_manager_worker('a', 'b')  # One remove too many is ignored
+    assert not index._edges
+
+
+def test_extension_rows_replace_and_remove_by_id():
+    index = AccessIndex()
+    index.apply_extension_changes('user', rows=[{'id': 1, 'manager_name': 'a', 'worker_name': 'b'},
+                                                {'id': 2, 'manager_name': 'a', 'worker_name': 'b'}])
+    index.apply_extension_changes('user', rows=[{'id': 1, 'manager_name': 'a', 'worker_name': 'b'}])  # Applied twice
+    assert index._edges[('a', 'b')] == 2
+    index.apply_extension_changes('user', rows=[{'id': 2, 'manager_name': 'a', 'worker_name': 'c'}])
+    assert index._reach['a'] == {'b', 'c'}
+    index.apply_extension_changes('user', removed_ids=['1', 3])
+    assert index._reach['a'] == {'c'}
+    assert closure(index) == closure(rebuilt(index))
+
+
+def test_teams_seen_through_workers():
+    index = AccessIndex()
+    index.add_manager_worker('a', 'b')
+    index.add_manager_worker('b', 'c')
+    index._add_team_edge('c', 'T1', 'bridgeuserteam')
+    index.apply_extension_changes('team', rows=[{'id': 1, 'worker_name': 'a', 'team_name': 'T2'},
+                                                {'id': 2, 'worker_name': 'c', 'team_name': 'T1'}])
+    assert index.teams_for_user('a') == {'T2': 'userteamextension', 'T1': 'via c'}
+    assert index.users_for_team('T1') == {'a', 'b', 'c'}
+    index.apply_extension_changes('team', removed_ids=[2])
+    assert index.teams_for_user('c') == {'T1': 'bridgeuserteam'}
+    index.remove_manager_worker('b', 'c')
+    assert index.teams_for_user('a') == {'T2': 'userteamextension'}
@@ -0,0 +1,92 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from change_feed import ChangeFeed, to_text
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+
+def row(row_id):
+    return {'id': row_id, 'worker_name': f"user{row_id}@example.com", 'team_name': 'Team'}
+
+
+@pytest.fixture
+def feed():
+    """A feed that has just polled START..START+100s, so changes_since reads only the events set here."""
+    feed = ChangeFeed('minerva_dev.accessmodel.userteamextension')
+    feed.log_start = START
+    feed.polled_to = at(100)
+    feed._polled_at = time.monotonic()
+    return feed
+
+
+def events(feed, *changes):
+    for kind, row_id, seconds in changes:
+        feed._events[(kind, row_id, at(seconds))] = row(row_id) if kind == 'insert' else None
+
+
+def test_other_sessions_changes_are_applied(feed):
+    events(feed, ('insert', 1, 10), ('delete', 2, 20))
+    changes = feed.changes_since(at(5))
+    assert changes == {'add': [row(1)], 'update': [], 'remove': [2], 'skipped': [], 'since': to_text(at(100))}
+
+
+def test_insert_then_delete_nets_to_nothing(feed):
+    events(feed, ('insert', 1, 10), ('delete', 1, 20))
+    changes = feed.changes_since(at(5))
+    assert (changes['add'], changes['update'], changes['remove']) == ([], [], [])
+
+
+def test_events_up_to_since_are_already_applied(feed):
+    events(feed, ('insert', 1, 10), ('delete', 1, 20), ('insert', 2, 20))
+    changes = feed.changes_since(at(10))
+    assert (changes['add'], changes['remove']) == ([row(2)], [1])
+    assert feed.changes_since(at(20))['add'] == []
+
+
+def test_own_changes_are_skipped(feed):
+    events(feed, ('insert', 1, 10), ('delete', 2, 20))
+    changes = feed.changes_since(at(5), own=[['insert', '1'], ['delete', 2]])  # As stored in a dcc.Store
+    assert (changes['add'], changes['update'], changes['remove']) == ([], [], [])
+    assert changes['skipped'] == [['insert', 1], ['delete', 2]]
+
+
+def test_own_insert_deleted_by_another_session_is_removed(feed):
+    events(feed, ('insert', 1, 10), ('delete', 1, 20))
+    changes = feed.changes_since(at(5), own=[('insert', 1)])
+    assert changes['remove'] == [1]
+    assert changes['skipped'] == [['insert', 1]]
+
+
+def test_own_delete_of_another_sessions_insert_is_not_added(feed):
+    events(feed, ('insert', 1, 10), ('delete', 1, 20))
+    changes = feed.changes_since(at(5), own=[('delete', 1)])
+    assert (changes['add'], changes['remove']) == ([], [])
+
+
+def test_own_kind_does_not_hide_the_other_kind(feed):
+    events(feed, ('insert', 1, 10), ('delete', 2, 20))
+    changes = feed.changes_since(at(5), own=[('delete', 1), ('insert', 2)])
+    assert (changes['add'], changes['remove'], changes['skipped']) == ([row(1)], [2], [])
+
+
+def test_since_older_than_the_log_needs_a_reload(feed):
+    assert feed.changes_since(START - timedelta(seconds=1)) is None
+    assert feed.changes_since(None) is None
+    assert feed.changes_since(to_text(START)) is not None
+
+
+def test_high_water_mark_never_moves_back(feed):
+    assert feed.changes_since(at(50))['since'] == to_text(at(100))
+    assert feed.changes_since(to_text(at(150)))['since'] == to_text(at(150))
+
+
+def test_latest_since_keeps_the_last_state(feed):
+    events(feed, ('insert', 1, 10), ('delete', 1, 20), ('insert', 2, 30), ('delete', 3, 5))
+    assert feed.latest_since(at(5)) == {'rows': {1: None, 2: row(2)}, 'since': at(100)}
@@ -0,0 +1,107 @@
+import pytest
+
+import backends
+import grid_rows
+
+COLUMNS = ['id', 'name', 'score']
+BASE_QUERY = "SELECT * FROM people"
+
+
+@pytest.fixture
+def duckdb(monkeypatch):
+    """An empty in-memory DuckDB backend holding a small people table."""
+    backend = backends.DuckDBBackend(path=':memory:', seed_rows=0)
+    monkeypatch.setattr(backends, '_backend', backend)
+    backend._root.execute("CREATE TABLE people (id INTEGER, name VARCHAR, score DOUBLE)")
+    backend._root.executemany("INSERT INTO people VALUES (?, ?, ?)", [
+        (1, 'Ann', 10), (2, '50% off', 20), (3, 'snake_case', 30), (4, "O'Brien", 40),
+        (5, 'bang!', 50), (6, 'snakeXcase', 60), (7, None, None), (8, 'ann', 10),
+    ])
+    return backend
+
+
+def ids(backend, filter_model=None, sort_model=None, start=0, end=100):
+    query = grid_rows.page_query(BASE_QUERY, COLUMNS, {'startRow': start, 'endRow': end,
+                                                         'filterModel': filter_model, 'sortModel': sort_model})
+    return [row[0] for row in backend._root.execute(query).fetchall()]
+
+
+def text(operator, value):
+    return {'filterType': 'text', 'type': operator, 'filter': value}
+
+
+def test_text_filters_ignore_case(duckdb):
+    assert ids(duckdb, {'name': text('equals', 'ANN')}) == [1, 8]
+    assert ids(duckdb, {'name': text('startsWith', 'sn')}) == [3, 6]
+    assert ids(duckdb, {'name': text('endsWith', 'CASE')}) == [3, 6]
+    assert ids(duckdb, {'name': text('notContains', 'a')}) == [2, 4]
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('%', [2]),
+    ('_', [3]),
+    ('e_c', [3]),
+    ('!', [5]),
+    ("'", [4]),
+    ("o'b", [4]),
+])
+def test_like_wildcards_and_quotes_match_literally(duckdb, value, expected):
+    assert ids(duckdb, {'name': text('contains', value)}) == expected
+
+
+def test_like_pattern_escapes_wildcards():
+    assert grid_rows._like_pattern('50%_!', 'contains') == '%50!%!_!!%'
+    assert grid_rows._like_pattern('Ab', 'startsWith') == 'ab%'
+    assert grid_rows._like_pattern('Ab', 'endsWith') == '%ab'
+
+
+def test_number_filters(duckdb):
+    number = {'filterType': 'number'}
+    assert ids(duckdb, {'score': {**number, 'type': 'greaterThanOrEqual', 'filter': 40}}) == [4, 5, 6]
+    assert ids(duckdb, {'score': {**number, 'type': 'inRange', 'filter': 20, 'filterTo': 30}}) == [2, 3]
+    with pytest.raises(ValueError):
+        ids(duckdb, {'score': {**number, 'type': 'contains', 'filter': 1}})
+    with pytest.raises(ValueError):
+        ids(duckdb, {'score': {**number, 'type': 'equals', 'filter': '1; DROP TABLE people'}})
+
+
+def test_blank_filters(duckdb):
+    assert ids(duckdb, {'name': {'filterType': 'text', 'type': 'blank'}}) == [7]
+    assert len(ids(duckdb, {'name': {'filterType': 'text', 'type': 'notBlank'}})) == 7
+
+
+def test_combined_conditions(duckdb):
+    either = {'filterType': 'text', 'operator': 'OR', 'conditions': [text('equals', 'bang!'), text('startsWith', '50')]}
+    assert ids(duckdb, {'name': either}) == [2, 5]
+    legacy = {'filterType': 'text', 'operator': 'AND', 'condition1': text('contains', 'snake'), 'condition2': text('endsWith', 'xcase')}
+    assert ids(duckdb, {'name': legacy}) == [6]
+    assert ids(duckdb, {'name': either, 'score': {'filterType': 'number', 'type': 'lessThan', 'filter': 30}}) == [2]
+
+
+def test_unknown_and_unsafe_columns_are_ignored():
+    model = {'missing': text('equals', 'x'), 'name; --': text('equals', 'x')}
+    assert grid_rows.where_clause(model, COLUMNS + ['name; --']) == ''
+    sort = [{'colId': 'missing', 'sort': 'asc'}, {'colId': 'name; --', 'sort': 'desc'}]
+    assert grid_rows.order_clause(sort, COLUMNS + ['name; --']) == ' ORDER BY id, name, score'
+
+
+def test_sort_appends_remaining_columns_as_tie_breakers():
+    sort = [{'colId': 'score', 'sort': 'desc'}, {'colId': 'name', 'sort': 'asc'}, {'colId': 'score', 'sort': 'asc'}]
+    assert grid_rows.order_clause(sort, COLUMNS) == ' ORDER BY score DESC, name ASC, id'
+
+
+def test_pages_are_stable_under_sort(duckdb):
+    sort = [{'colId': 'score', 'sort': 'asc'}]
+    pages = ids(duckdb, sort_model=sort, end=3) + ids(duckdb, sort_model=sort, start=3, end=6) + ids(duckdb, sort_model=sort, start=6, end=9)
+    assert pages == [1, 8, 2, 3, 4, 5, 6, 7]
+
+
+def test_count_matches_filter(duckdb):
+    query = grid_rows.count_query(BASE_QUERY, COLUMNS, {'filterModel': {'name': text('contains', '_')}})
+    assert duckdb._root.execute(query).fetchone()[0] == 1
+
+
+def test_databricks_literal_escapes_backslashes_and_quotes(monkeypatch):
+    monkeypatch.setattr(backends, '_backend', object.__new__(backends.DatabricksBackend))  # No warehouse needed to quote
+    condition = grid_rows._condition('name', text('contains', "it's 100%\\"))
+    assert condition == "LOWER(CAST(name AS STRING)) LIKE '%it\\'s 100!%\\\\%' ESCAPE '!'"